@@ -0,0 +1 @@
+# benchmarks on synthetic streams, see suite.py
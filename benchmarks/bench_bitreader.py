@@ -0,0 +1,82 @@
+# Micro-benchmark of the BitReader backends on StreamMuxConfig.decode and
+# AudioMuxElement.decode.
+#
+#   python benchmarks/bench_bitreader.py [-n NUMBER] [BACKEND...]
+#
+# Each backend runs in its own interpreter, since the backend is picked when
+# pylatmparser is imported.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import timeit
+
+def sample_frame() -> bytes:
+    # AudioMuxElement (useSameStreamMux=0) carrying an AAC-LC 48kHz stereo
+    # StreamMuxConfig and a 400 byte payload
+    from pylatmparser.bitstream import BitWriter
+    bits = BitWriter()
+    bits.write(0, 1)                    # useSameStreamMux
+    bits.write(0, 1)                    # audioMuxVersion
+    bits.write(1, 1)                    # allStreamsSameTimeFraming
+    bits.write(0, 6)                    # numSubFrames
+    bits.write(0, 4)                    # numProgram
+    bits.write(0, 3)                    # numLayer
+    bits.write(2, 5)                    # audioObjectType
+    bits.write(3, 4)                    # samplingFrequencyIndex
+    bits.write(2, 4)                    # channelConfiguration
+    bits.write(0, 3)                    # GASpecificConfig
+    bits.write(0, 3)                    # frameLengthType
+    bits.write(0xff, 8)                 # latmBufferFullness
+    bits.write(0, 1)                    # otherDataPresent
+    bits.write(0, 1)                    # crcCheckPresent
+    for _ in range(400 // 255):
+        bits.write(0xff, 8)
+    bits.write(400 % 255, 8)
+    for i in range(400):
+        bits.write(i & 0xff, 8)
+    return bits.tobytes()
+
+def run(number: int) -> dict[str, float]:
+    from pylatmparser.bitstream import BitReader
+    from pylatmparser.latm import StreamMuxConfig, AudioMuxElement
+    frame = sample_frame()
+    config = AudioMuxElement.decode(BitReader(frame), None, True).stream_mux_config
+
+    def decode_config():
+        bits = BitReader(frame)
+        bits.skip(1)
+        StreamMuxConfig.decode(bits)
+
+    def decode_element():
+        AudioMuxElement.decode(BitReader(frame), config, True)
+
+    results = {}
+    for name, func in (('StreamMuxConfig.decode', decode_config), ('AudioMuxElement.decode', decode_element)):
+        results[name] = min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='compare BitReader backends')
+    parser.add_argument('-n', '--number', type=int, default=2000, help='calls per measurement')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('backends', nargs='*')
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run(args.number)))
+        return
+
+    from pylatmparser.bitstream import available_backends
+    backends = args.backends or available_backends()
+    print(f'{"backend":10} {"StreamMuxConfig.decode":>24} {"AudioMuxElement.decode":>24}')
+    for backend in backends:
+        env = dict(os.environ, PYLATMPARSER_BITSTREAM=backend)
+        out = subprocess.run([sys.executable, __file__, '--child', '-n', str(args.number)],
+                             env=env, check=True, capture_output=True, text=True).stdout
+        results = json.loads(out)
+        print(f'{backend:10} {results["StreamMuxConfig.decode"]:21.2f} us {results["AudioMuxElement.decode"]:21.2f} us')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+# Parser benchmarks on synthetic streams: audio_sync_stream, adts_sequence,
+# latm2adts and latmdump, for each scenario and BitReader backend.
+#
+#   python -m benchmarks [-s SCENARIO...] [-w WORKLOAD...] [-b BACKEND...]
+#                        [-r REPEAT] [--frames N] [-o RESULTS.json] [--compare BASELINE.json]
+#
+# Run from the repository root with pylatmparser importable. Each backend
+# runs in its own interpreter, since the backend is picked when pylatmparser
+# is imported. The JSON output records the commit, so runs of different
+# commits can be compared with --compare.
+from __future__ import annotations
+from dataclasses import asdict, replace
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from .synth import SynthSpec, synth_adts, synth_loas
+
+RESULTS_VERSION = 1
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS: dict[str, SynthSpec] = {
+    'lc': SynthSpec(),
+    'he-aac': SynthSpec(profile='he'),
+    'he-aac-v2': SynthSpec(profile='hev2'),
+    'pce': SynthSpec(profile='pce'),
+    'sub-frames': SynthSpec(num_sub_frames=4, payload_size=200),
+    'programs': SynthSpec(programs=2, layers=2, payload_size=150),
+    'config-once': SynthSpec(config_interval=0),
+    'config-every-8': SynthSpec(config_interval=8),
+    'garbage': SynthSpec(garbage_rate=0.25),
+}
+WORKLOADS = ('audio_sync_stream', 'audio_sync_stream_lazy', 'adts_sequence', 'latm2adts', 'latmdump')
+
+
+def _time(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _workload(name: str, scenario: dict, out_dir: str):
+    # returns (function to time, input path)
+    loas_path, adts_path = scenario['loas'], scenario['adts']
+    from pylatmparser.adts import adts_sequence
+    from pylatmparser.latm import audio_sync_stream
+    from pylatmparser.latm2adts import convert_latm_to_adts
+    from pylatmparser.latmdump import dump_frames
+
+    if name == 'audio_sync_stream' or name == 'audio_sync_stream_lazy':
+        lazy = name == 'audio_sync_stream_lazy'
+
+        def run():
+            with open(loas_path, 'rb') as fp:
+                for _ in audio_sync_stream(fp, lazy=lazy):
+                    pass
+        return run, loas_path
+    if name == 'adts_sequence':
+        def run():
+            with open(adts_path, 'rb') as fp:
+                for _ in adts_sequence(fp):
+                    pass
+        return run, adts_path
+    if name == 'latm2adts':
+        dst = os.path.join(out_dir, 'out.aac')
+        # ADTS can't carry a config given by a PCE, so those go out as raw AUs
+        raw_au = scenario['profile'] == 'pce'
+        return lambda: convert_latm_to_adts(loas_path, dst, raw_au=raw_au), loas_path
+    if name == 'latmdump':
+        # the CLI default: text format with hex payloads
+        def run():
+            with open(loas_path, 'rb') as fp, open(os.devnull, 'w') as out:
+                dump_frames(audio_sync_stream(fp), out)
+        return run, loas_path
+    raise ValueError(f'unknown workload: {name}')
+
+
+def run_child(job: dict) -> list[dict]:
+    from pylatmparser.bitstream import BACKEND
+    results = []
+    for scenario in job['scenarios']:
+        name = scenario['name']
+        for workload in job['workloads']:
+            func, path = _workload(workload, scenario, job['out_dir'])
+            # ADTS has a frame per sub frame
+            frames = scenario['adts_frames'] if workload == 'adts_sequence' else scenario['frames']
+            seconds = _time(func, job['repeat'])
+            size = os.path.getsize(path)
+            results.append({ 'backend': BACKEND, 'scenario': name, 'workload': workload,
+                             'seconds': seconds, 'frames': frames, 'bytes': size,
+                             'frames_per_second': frames / seconds, 'mb_per_second': size / seconds / 1e6 })
+    return results
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def _key(result: dict) -> tuple[str, str, str]:
+    return (result['backend'], result['scenario'], result['workload'])
+
+
+def print_results(results: list[dict], baseline: list[dict] | None = None) -> None:
+    base = { _key(result): result for result in baseline or [] }
+    header = f'{"backend":9} {"scenario":15} {"workload":23} {"seconds":>9} {"frames/s":>10} {"MB/s":>7}'
+    print(header + ('  vs base' if baseline is not None else ''))
+    for result in results:
+        line = (f'{result["backend"]:9} {result["scenario"]:15} {result["workload"]:23} '
+                f'{result["seconds"]:9.4f} {result["frames_per_second"]:10.0f} {result["mb_per_second"]:7.1f}')
+        if baseline is not None:
+            old = base.get(_key(result))
+            # > 1: faster than the baseline
+            line += f'  {old["seconds"] / result["seconds"]:6.2f}x' if old else '       -'
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='benchmark the parsers on synthetic streams')
+    parser.add_argument('-s', '--scenario', action='append', choices=list(SCENARIOS),
+                        help='scenario to run, repeatable (default: all)')
+    parser.add_argument('-w', '--workload', action='append', choices=WORKLOADS,
+                        help='workload to run, repeatable (default: all)')
+    parser.add_argument('-b', '--backend', action='append',
+                        help='BitReader backend, repeatable (default: all available)')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='runs per measurement, the best is kept (default: 3)')
+    parser.add_argument('--frames', type=int, help='frames per scenario (default: per scenario, 2000)')
+    parser.add_argument('-o', '--output', help='write the results as JSON to OUTPUT')
+    parser.add_argument('--compare', metavar='BASELINE', help='show speedups against a previous JSON output')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        with open(args.child) as fp:
+            print(json.dumps(run_child(json.load(fp))))
+        return
+
+    from pylatmparser.bitstream import available_backends
+    backends = args.backend or available_backends()
+    scenarios = { name: SCENARIOS[name] for name in (args.scenario or SCENARIOS) }
+    if args.frames:
+        scenarios = { name: replace(spec, frames=args.frames) for name, spec in scenarios.items() }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)['results']
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        job = { 'scenarios': [], 'workloads': args.workload or list(WORKLOADS), 'repeat': args.repeat, 'out_dir': tmp }
+        for name, spec in scenarios.items():
+            loas, adts = os.path.join(tmp, f'{name}.latm'), os.path.join(tmp, f'{name}.aac')
+            with open(loas, 'wb') as fp:
+                fp.write(synth_loas(spec))
+            with open(adts, 'wb') as fp:
+                fp.write(synth_adts(spec))
+            job['scenarios'].append({ 'name': name, 'loas': loas, 'adts': adts, 'frames': spec.frames,
+                                      'adts_frames': spec.frames * spec.num_sub_frames, 'profile': spec.profile })
+        job_path = os.path.join(tmp, 'job.json')
+        with open(job_path, 'w') as fp:
+            json.dump(job, fp)
+        for backend in backends:
+            env = dict(os.environ, PYLATMPARSER_BITSTREAM=backend)
+            out = subprocess.run([sys.executable, '-m', 'benchmarks.suite', '--child', job_path],
+                                 cwd=ROOT, env=env, check=True, stdout=subprocess.PIPE, text=True).stdout
+            results += json.loads(out)
+
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump({ 'version': RESULTS_VERSION, 'commit': _git_commit(), 'python': platform.python_version(),
+                        'platform': platform.platform(), 'repeat': args.repeat,
+                        'scenarios': { name: asdict(spec) for name, spec in scenarios.items() },
+                        'results': results }, fp, indent=1)
+            fp.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+# Synthetic LOAS/LATM and ADTS streams for the benchmarks: random payloads in
+# valid framing, so parsers and remuxers can be timed without sample files.
+# Output depends only on the SynthSpec (the seed included).
+from __future__ import annotations
+from dataclasses import dataclass
+import random
+from pylatmparser.asc import (AudioSpecificConfig, ChannelElement, Format, GASpecificConfig,
+                              ProgramConfigElement)
+from pylatmparser.adts import ADTSHeader
+from pylatmparser.bitstream import BitWriter
+from pylatmparser.latm import Stream, StreamMuxConfig
+
+PROFILES = ('lc', 'he', 'hev2', 'pce')
+LOAS_SYNC_WORD = 0x2b7
+LOAS_MAX_ELEMENT_SIZE = 0x1fff
+
+@dataclass(eq=True, slots=True)
+class SynthSpec:
+    frames: int = 2000
+    programs: int = 1
+    # per program
+    layers: int = 1
+    num_sub_frames: int = 1
+    # StreamMuxConfig in every config_interval-th frame, only in the first if 0
+    config_interval: int = 1
+    # lc: AAC-LC stereo, he: SBR, hev2: SBR+PS mono, pce: AAC-LC 5.1 described by a PCE
+    profile: str = 'lc'
+    # mean AU size in bytes, per stream and sub frame (clipped so frames fit)
+    payload_size: int = 400
+    # chance of junk between two frames, and its maximum length. junk never
+    # contains 0x56 or 0xff, so it can't fake a sync word
+    garbage_rate: float = 0.0
+    garbage_max: int = 64
+    seed: int = 0
+
+
+def make_asc(profile: str) -> AudioSpecificConfig:
+    if profile == 'lc':
+        return AudioSpecificConfig.from_format(Format(audio_object_type=2, channel_configuration=2,
+                                                      sampling_frequency_index=3))
+    if profile in ('he', 'hev2'):
+        # 24kHz core, 48kHz output
+        asc = AudioSpecificConfig.from_format(Format(audio_object_type=2,
+                                                     channel_configuration=1 if profile == 'hev2' else 2,
+                                                     sampling_frequency_index=6))
+        asc.extension_format = Format(audio_object_type=5, sampling_frequency_index=3)
+        asc.sbr_present_flag = 1
+        if profile == 'hev2':
+            asc.ps_present_flag = 1
+        return asc
+    if profile == 'pce':
+        pce = ProgramConfigElement(object_type=1, sampling_frequency_index=3,
+                                   front_channel_elements=[ChannelElement(is_cpe=0, tag_select=0),
+                                                           ChannelElement(is_cpe=1, tag_select=0)],
+                                   back_channel_elements=[ChannelElement(is_cpe=1, tag_select=1)],
+                                   lfe_channel_elements=[ChannelElement(tag_select=0)])
+        return AudioSpecificConfig(format=Format(audio_object_type=2, channel_configuration=0,
+                                                 sampling_frequency_index=3),
+                                   codec_specific_config=GASpecificConfig(program_config_elment=pce))
+    raise ValueError(f'unknown profile: {profile} (choose from {", ".join(PROFILES)})')
+
+
+def make_config(spec: SynthSpec) -> StreamMuxConfig:
+    asc = make_asc(spec.profile)
+    streams = []
+    for program in range(spec.programs):
+        for layer in range(spec.layers):
+            streams.append(Stream(id=len(streams), program=program, layer=layer,
+                                  audio_specific_config=asc, latm_buffer_fullness=0xff))
+    return StreamMuxConfig(all_streams_same_time_framing=1, num_sub_frames=spec.num_sub_frames,
+                           num_program=spec.programs, streams=streams)
+
+
+def _payload_sizes(rng: random.Random, spec: SynthSpec, count: int) -> list[int]:
+    # uniform in [size / 2, size * 3 / 2], within the element size limit
+    # (with room for the config and a length byte per 255)
+    limit = (LOAS_MAX_ELEMENT_SIZE - 128) // count * 255 // 256 - 1
+    size = min(spec.payload_size, limit * 2 // 3)
+    return [rng.randint(max(size // 2, 1), size * 3 // 2) for _ in range(count)]
+
+
+def _garbage(rng: random.Random, spec: SynthSpec) -> bytes:
+    if not spec.garbage_rate or rng.random() >= spec.garbage_rate:
+        return b''
+    junk = rng.randbytes(rng.randint(1, spec.garbage_max))
+    return junk.replace(b'\x56', b'\x00').replace(b'\xff', b'\x00')
+
+
+def synth_loas(spec: SynthSpec) -> bytes:
+    rng = random.Random(spec.seed)
+    config = make_config(spec)
+    num_streams = len(config.streams)
+    out = bytearray()
+    for i in range(spec.frames):
+        bits = BitWriter()
+        if i == 0 or (spec.config_interval and i % spec.config_interval == 0):
+            bits.write(0, 1)
+            config.encode(bits)
+        else:
+            bits.write(1, 1)
+        sizes = _payload_sizes(rng, spec, num_streams * spec.num_sub_frames)
+        for sub_frame in range(spec.num_sub_frames):
+            # PayloadLengthInfo(), then PayloadMux()
+            lengths = sizes[sub_frame * num_streams:(sub_frame + 1) * num_streams]
+            for n in lengths:
+                for _ in range(n // 255):
+                    bits.write(0xff, 8)
+                bits.write(n % 255, 8)
+            for n in lengths:
+                bits.write_bytes(rng.randbytes(n))
+        element = bits.tobytes()
+        out += _garbage(rng, spec)
+        out += (LOAS_SYNC_WORD << 13 | len(element)).to_bytes(3, 'big')
+        out += element
+    return bytes(out)
+
+
+def synth_adts(spec: SynthSpec) -> bytes:
+    # the first stream only, one raw_data_block per frame; SBR/PS are implicit
+    # in ADTS, so only the core format is signalled. the header is built
+    # directly, since from_format() refuses channel_configuration 0 (pce)
+    rng = random.Random(spec.seed)
+    format = make_asc(spec.profile).format
+    template = ADTSHeader(audio_object_type=format.audio_object_type,
+                          channel_configuration=format.channel_configuration,
+                          sampling_frequency_index=format.sampling_frequency_index,
+                          protection_absent=1, adts_buffer_fullness=0x7ff).compile()
+    out = bytearray()
+    for i in range(spec.frames * spec.num_sub_frames):
+        n = _payload_sizes(rng, spec, 1)[0]
+        out += _garbage(rng, spec)
+        out += template.tobytes(n)
+        out += rng.randbytes(n)
+    return bytes(out)
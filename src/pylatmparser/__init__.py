@@ -1,5 +1,14 @@
 from .asc import *
+from .stats import *
 from .latm import *
 from .adts import *
+from .index import *
+from .table import *
+from .parallel import *
+from .ts import *
+from .probe import *
+from .pipeline import *
+from .sink import *
 from .latm2adts import *
+from .adts2latm import *
 from .latmdump import *
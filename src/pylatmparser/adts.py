@@ -1,10 +1,16 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import IO, Iterable
+from collections.abc import ByteString
+from typing import IO, Callable, Iterator, TYPE_CHECKING
+import itertools
+import time
 from .bitstream import BitReader, BitWriter
 from .asc import Format
+from .stats import ParseStats, _end_offset
+if TYPE_CHECKING:
+    from .index import FrameIndex
 
-__all__ = [ 'ADTSHeader', 'adts_sequence' ]
+__all__ = [ 'ADTSHeader', 'ADTSHeaderTemplate', 'adts_frames', 'adts_sequence' ]
 
 ADTS_HEADER_LENGTH = 7
 
@@ -44,14 +50,66 @@ class ADTSHeader(Format):
         obj.aac_frame_length = bits.read(13)
         obj.adts_buffer_fullness = bits.read(11)
         obj.number_of_raw_data_blocks_in_frame = bits.read(2)
-        if obj.number_of_raw_data_blocks_in_frame != 0:
-            raise NotImplementedError(f'ADTS: number_of_raw_data_blocks_in_frame > 0 is not supported')
         return obj
+
+    @property
+    def format_key(self) -> tuple[int, int, int]:
+        # the fixed header fields that make up the format; a change in any of
+        # them is a config change
+        return (self.audio_object_type, self.sampling_frequency_index, self.channel_configuration)
+
+    @property
+    def raw_data_length(self) -> int:
+        # bytes of raw_data_block()s in the frame, without CRCs and positions
+        n = self.number_of_raw_data_blocks_in_frame
+        if self.protection_absent:
+            overhead = 0
+        elif n:
+            overhead = 2 * n + 2 + 2 * (n + 1)
+        else:
+            overhead = 2
+        return self.aac_frame_length - ADTS_HEADER_LENGTH - overhead
+
+    def raw_data_blocks(self, frame: ByteString) -> list[memoryview]:
+        # views of the raw_data_block()s of frame (the whole adts_frame()).
+        # with several blocks, they are located with raw_data_block_position,
+        # which is only present when the frame is CRC protected
+        frame = memoryview(frame)
+        n = self.number_of_raw_data_blocks_in_frame
+        end = self.aac_frame_length
+        if self.protection_absent:
+            if n:
+                raise NotImplementedError('ADTS: unprotected frames with multiple raw_data_blocks are unsupported')
+            return [frame[ADTS_HEADER_LENGTH:end]]
+        if not n:
+            return [frame[ADTS_HEADER_LENGTH + 2:end]]
+        # raw_data_block_position[1..n] and crc_check, then each block
+        # followed by its crc_check; positions are relative to the first block
+        start = ADTS_HEADER_LENGTH + 2 * n + 2
+        positions = [0]
+        for i in range(ADTS_HEADER_LENGTH, ADTS_HEADER_LENGTH + 2 * n, 2):
+            positions.append(frame[i] << 8 | frame[i + 1])
+        positions.append(end - start)
+        blocks = []
+        for i in range(n + 1):
+            block_start = start + positions[i]
+            block_end = start + positions[i + 1] - 2
+            if block_end < block_start or block_end > end - 2:
+                raise ValueError(f'ADTS: invalid raw_data_block_position: {positions[1:-1]}')
+            blocks.append(frame[block_start:block_end])
+        return blocks
     
+    @classmethod
+    def supports(cls, format: Format) -> bool:
+        # profile is AOT - 1 in 2 bits; channel_configuration 0 would need
+        # a program_config_element in the raw data block
+        return 1 <= format.audio_object_type <= 4 and format.channel_configuration != 0
+
     @classmethod
     def from_format(cls, format: Format, payload_len: int) -> ADTSHeader:
-        if format.audio_object_type != 2 or format.channel_configuration == 0:
-            raise NotImplementedError(f'ADTS: format not supported')
+        if not cls.supports(format):
+            raise NotImplementedError(f'ADTS can not carry AOT {format.audio_object_type} '
+                                      f'with channel_configuration {format.channel_configuration}')
         obj = ADTSHeader()
         obj.protection_absent = 1
         obj.audio_object_type = format.audio_object_type
@@ -78,39 +136,141 @@ class ADTSHeader(Format):
         bits.write(self.adts_buffer_fullness, 11)
         bits.write(self.number_of_raw_data_blocks_in_frame, 2)
     
+    @property
+    def frame_duration(self) -> float:
+        # duration of an ADTS frame in seconds, 0.0 if unknown
+        sample_rate = self.sample_rate
+        if not sample_rate:
+            return 0.0
+        return 1024 * (self.number_of_raw_data_blocks_in_frame + 1) / sample_rate
+
     def tobytes(self) -> bytes:
         bits = BitWriter()
         self.encode(bits)
         return bits.tobytes()
 
+    def compile(self) -> ADTSHeaderTemplate:
+        return ADTSHeaderTemplate(self)
 
-def resync(fp: IO[bytes], buf: memoryview) -> int:
-    if not fp.readinto(buf[:1]):
-        return 0
-    word = buf[0]
-    while True:
-        if not fp.readinto(buf[:1]):
-            return 0
-        word = (word << 8 | buf[0]) & 0xffff
-        if word >> 4 != 0xfff:
-            continue
-        return word
 
+class ADTSHeaderTemplate:
+    # ADTS header with everything but aac_frame_length encoded in advance
+    def __init__(self, header: ADTSHeader):
+        if not header.protection_absent:
+            raise NotImplementedError('ADTS: template with CRC is not supported')
+        value = int.from_bytes(header.tobytes(), 'big')
+        self.value = value & ~(0x1fff << 13)
 
-def adts_sequence(fp: IO[bytes]) -> Iterable[tuple[ADTSHeader, bytes]]:
-    buf = memoryview(bytearray(0x2000))
+    def tobytes(self, payload_len: int) -> bytes:
+        aac_frame_length = payload_len + ADTS_HEADER_LENGTH
+        if aac_frame_length > 0x1fff:
+            raise ValueError(f'ADTS: frame too long: {aac_frame_length}')
+        return (self.value | aac_frame_length << 13).to_bytes(ADTS_HEADER_LENGTH, 'big')
+
+
+ADTS_CHUNK_SIZE = 0x10000
+
+def adts_frames(fp: IO[bytes], chunk_size: int=ADTS_CHUNK_SIZE) -> Iterator[tuple[int, ADTSHeader, memoryview]]:
+    # yields (offset relative to the initial position, header, frame) for
+    # each adts_frame(), header included. the stream is read and searched
+    # for sync words in chunks; frames are views of immutable chunks, so they
+    # stay valid. headers are decoded with shifts from one int, and the
+    # fixed header fields are reused while they don't change.
+    buf = b''
+    view = memoryview(buf)
+    base = 0
+    pos = 0
+    eof = False
+    fixed = -1
+    fixed_fields: tuple = ()
     while True:
-        word = resync(fp, buf)
-        if word >> 4 != 0xfff:
-            break
-        buf[0] = word >> 8
-        buf[1] = word & 0xff
-        if fp.readinto(buf[2:ADTS_HEADER_LENGTH]) != ADTS_HEADER_LENGTH - 2:
-            break
-        hdr = ADTSHeader.decode(BitReader(buf[:ADTS_HEADER_LENGTH]))
-        if fp.readinto(buf[ADTS_HEADER_LENGTH:hdr.aac_frame_length]) != hdr.aac_frame_length - ADTS_HEADER_LENGTH:
-            break
-        # we only handle the case where number_of_raw_data_blocks_in_frame == 0
-        off = ADTS_HEADER_LENGTH if hdr.protection_absent else ADTS_HEADER_LENGTH + 2
-        yield (hdr, buf[off:hdr.aac_frame_length].tobytes())
-        
\ No newline at end of file
+        end = len(buf)
+        if end - pos >= ADTS_HEADER_LENGTH:
+            # syncword and layer == 0
+            if buf[pos] != 0xff or buf[pos + 1] & 0xf6 != 0xf0:
+                pos = buf.find(b'\xff', pos + 1)
+                if pos < 0:
+                    pos = end
+                continue
+            h = int.from_bytes(buf[pos:pos + ADTS_HEADER_LENGTH], 'big')
+            aac_frame_length = h >> 13 & 0x1fff
+            if aac_frame_length < ADTS_HEADER_LENGTH:
+                pos += 1
+                continue
+            if pos + aac_frame_length <= end:
+                if h >> 28 != fixed:
+                    fixed = h >> 28
+                    # audio_object_type, channel_configuration, sampling_frequency_index, sampling_frequency,
+                    # id, layer, protection_absent, private_bit, original_copy, home
+                    fixed_fields = ((h >> 38 & 3) + 1, h >> 30 & 7, h >> 34 & 0xf, None,
+                                    h >> 43 & 1, 0, h >> 40 & 1, h >> 33 & 1, h >> 29 & 1, h >> 28 & 1)
+                hdr = ADTSHeader(*fixed_fields, h >> 27 & 1, h >> 26 & 1, aac_frame_length, h >> 2 & 0x7ff, h & 3)
+                yield base + pos, hdr, view[pos:pos + aac_frame_length]
+                pos += aac_frame_length
+                continue
+        if eof:
+            return
+        data = fp.read(chunk_size)
+        if not data:
+            eof = True
+        buf = buf[pos:] + data
+        view = memoryview(buf)
+        base += pos
+        pos = 0
+
+
+def adts_sequence(fp: IO[bytes], start_time: float | None = None, end_time: float | None = None,
+                  index: FrameIndex | None = None,
+                  stats: ParseStats | None = None) -> Iterator[tuple[ADTSHeader, memoryview]]:
+    # (header, raw_data_block) for each raw_data_block; a frame with several
+    # blocks yields each with the same header
+    if start_time is not None or end_time is not None:
+        if index is None:
+            from .index import FrameIndex
+            index = FrameIndex.for_stream(fp, 'adts')
+        first, last = index.frame_range(start_time, end_time)
+        if first >= last:
+            return
+        fp.seek(index.offsets[first])
+        frames = itertools.islice(adts_frames(fp), last - first)
+        end = None
+    else:
+        frames = adts_frames(fp)
+        end = _end_offset(fp) if stats is not None else None
+    if stats is not None:
+        yield from _adts_blocks_stats(frames, stats, end)
+        return
+    for _, hdr, frame in frames:
+        for payload in hdr.raw_data_blocks(frame):
+            yield (hdr, payload)
+
+
+def _adts_blocks_stats(frames: Iterator[tuple[int, ADTSHeader, memoryview]], stats: ParseStats,
+                       end: Callable[[], int] | None = None) -> Iterator[tuple[ADTSHeader, memoryview]]:
+    # adts_sequence() with stats. headers are decoded along with the sync
+    # search, so they count as 'sync'; a changed fixed header is a config change.
+    # end gives the end of input once frames is exhausted (see _end_offset())
+    expected = 0
+    fixed_header: tuple[int, int, int] | None = None
+    for offset, hdr, frame in stats.timed(frames, 'sync'):
+        if offset > expected:
+            stats.resync_bytes += offset - expected
+        expected = offset + hdr.aac_frame_length
+        key = hdr.format_key
+        if key != fixed_header:
+            fixed_header = key
+            stats.config_changes += 1
+        start = time.perf_counter()
+        try:
+            blocks = hdr.raw_data_blocks(frame)
+        except Exception:
+            stats.decode_errors += 1
+            raise
+        finally:
+            stats.times['payload'] += time.perf_counter() - start
+        stats.bytes_in += hdr.aac_frame_length
+        stats.tick()
+        for payload in blocks:
+            yield (hdr, payload)
+    if end is not None:
+        stats.resync_bytes += max(end() - expected, 0)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+import argparse
+import sys
+import time
+from .bitstream import serialize_bits
+from .latm import StreamMuxConfig
+from .adts import adts_sequence
+from .latm2adts import ConversionResult
+from .stats import ParseStats
+
+__all__ = [ 'LoasMuxer', 'convert_adts_to_latm', 'adts2latm' ]
+
+LOAS_SYNC_WORD = 0x2b7
+LOAS_MAX_ELEMENT_SIZE = 0x1fff
+
+
+class LoasMuxer:
+    # AudioSyncStream writer for one stream in one sub frame per
+    # AudioMuxElement. the StreamMuxConfig is serialized once; each element
+    # is put together from it, the slot length bytes and the payload with a
+    # single shift instead of going through a BitWriter.
+    def __init__(self, stream_mux_config: StreamMuxConfig, config_interval: int=1):
+        # StreamMuxConfig is repeated every config_interval elements, or only
+        # in the first one if 0; the others have useSameStreamMux set
+        self.config_interval = config_interval
+        self.count = 0
+        self.set_config(stream_mux_config)
+
+    def set_config(self, stream_mux_config: StreamMuxConfig) -> None:
+        # the next element carries the new config
+        mc = stream_mux_config
+        if len(mc.streams) != 1 or mc.num_sub_frames != 1 or mc.other_data_present:
+            raise NotImplementedError('LoasMuxer: only a single stream in a single sub frame is supported')
+        if mc.streams[0].frame_length_type != 0:
+            raise NotImplementedError(f"unsupported frame_length_type: {mc.streams[0].frame_length_type}")
+        asc = mc.streams[0].audio_specific_config
+        if asc.format.channel_configuration == 0 and getattr(asc.codec_specific_config, 'program_config_elment', None) is None:
+            # ADTS carries the program_config_element in the raw data block,
+            # where it can't be moved into the AudioSpecificConfig
+            raise NotImplementedError('LoasMuxer: channel_configuration 0 without a program_config_element is not supported')
+        self.stream_mux_config = mc
+        # useSameStreamMux = 0, then StreamMuxConfig()
+        self.config_prefix = serialize_bits(lambda bits: (bits.write(0, 1), mc.encode(bits)))
+        self.count = 0
+
+    def tobytes(self, payload: bytes) -> bytes:
+        # AudioMuxElement(muxConfigPresent=1) with its sync header
+        interval = self.config_interval
+        if self.count == 0 or (interval and self.count % interval == 0):
+            prefix, prefix_bits = self.config_prefix
+        else:
+            prefix, prefix_bits = 1, 1
+        self.count += 1
+        n = len(payload)
+        # PayloadLengthInfo(): 255 escapes, then the remainder
+        length_bytes = n // 255 + 1
+        length_info = (1 << 8 * (length_bytes - 1)) - 1 << 8 | n % 255
+        head_bits = prefix_bits + 8 * length_bytes
+        head = prefix << 8 * length_bytes | length_info
+        if head_bits & 7:
+            pad = -head_bits & 7
+            size = (head_bits + pad) // 8 + n
+            element = ((head << 8 * n | int.from_bytes(payload, 'big')) << pad).to_bytes(size, 'big')
+        else:
+            size = head_bits // 8 + n
+            element = head.to_bytes(head_bits // 8, 'big') + payload
+        if size > LOAS_MAX_ELEMENT_SIZE:
+            raise ValueError(f'LOAS: AudioMuxElement too long: {size}')
+        return (LOAS_SYNC_WORD << 13 | size).to_bytes(3, 'big') + element
+
+
+def convert_adts_to_latm(src: str, dst: str, config_interval: int=1,
+                         stats: ParseStats | None = None) -> ConversionResult:
+    # with stats, muxing and writing count as 'write'
+    result = ConversionResult(src=src, dst=dst, stats=stats)
+    start = time.perf_counter()
+    muxer: LoasMuxer | None = None
+    fixed_header: tuple[int, int, int] | None = None
+    with open(src, 'rb') as sp:
+        with open(dst, 'wb') as dp:
+            for hdr, payload in adts_sequence(sp, stats=stats):
+                if stats is not None:
+                    write_start = time.perf_counter()
+                key = hdr.format_key
+                if key != fixed_header:
+                    fixed_header = key
+                    stream_mux_config = StreamMuxConfig.from_format(hdr)
+                    if muxer is None:
+                        muxer = LoasMuxer(stream_mux_config, config_interval)
+                    else:
+                        muxer.set_config(stream_mux_config)
+                dp.write(muxer.tobytes(payload))
+                if stats is not None:
+                    stats.times['write'] += time.perf_counter() - write_start
+                result.frames += 1
+            result.bytes_in = sp.tell()
+            result.bytes_out = dp.tell()
+    result.elapsed = time.perf_counter() - start
+    if stats is not None:
+        stats.bytes_out = result.bytes_out
+        stats.finish()
+    return result
+
+
+def adts2latm():
+    parser = argparse.ArgumentParser(prog='adts2latm', description='remux ADTS into LATM/LOAS (AudioSyncStream)')
+    parser.add_argument('src', metavar='ADTSFILE')
+    parser.add_argument('dst', metavar='LATMFILE')
+    parser.add_argument('-n', '--config-interval', type=int, default=1,
+                        help='repeat StreamMuxConfig every N frames; 0: only in the first frame (default: 1)')
+    parser.add_argument('--stats', action='store_true',
+                        help='print frame, byte and error counters and time per stage to stderr')
+    args = parser.parse_args()
+    stats = ParseStats() if args.stats else None
+    convert_adts_to_latm(args.src, args.dst, args.config_interval, stats)
+    if stats is not None:
+        print(stats, file=sys.stderr)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-from .bitstream import BitReader
+from .bitstream import BitReader, BitWriter, serialize_bits, write_bits
 import sys
 
 __all__ = [
@@ -32,6 +32,11 @@ class ChannelElement:
         obj.tag_select = bits.read(4)
         return obj
 
+    def encode(self, bits: BitWriter, encode_cpe: bool) -> None:
+        if encode_cpe:
+            bits.write(self.is_cpe, 1)
+        bits.write(self.tag_select, 4)
+
 @dataclass(eq=True, slots=True)
 class CCElement:
     is_ind_sw: int = 0
@@ -44,6 +49,10 @@ class CCElement:
         obj.tag_select = bits.read(4)
         return obj
 
+    def encode(self, bits: BitWriter) -> None:
+        bits.write(self.is_ind_sw, 1)
+        bits.write(self.tag_select, 4)
+
 @dataclass(eq=True, slots=True)
 class MatrixMixdown:
     idx: int = 0
@@ -56,6 +65,10 @@ class MatrixMixdown:
         obj.psuedo_surround_enable = bits.read(1)
         return obj
 
+    def encode(self, bits: BitWriter) -> None:
+        bits.write(self.idx, 2)
+        bits.write(self.psuedo_surround_enable, 1)
+
 @dataclass(eq=True, slots=True)
 class ProgramConfigElement:
     element_instance_tag: int = 0
@@ -119,9 +132,49 @@ class ProgramConfigElement:
         bits.byte_align()
         comment_field_bytes = bits.read(8)
         if comment_field_bytes:
-            obj.comment_field_data = bits.read_bytes(comment_field_bytes)
+            # copied: an aligned read is a view of the frame, which the
+            # caller may reuse while this config stays cached
+            obj.comment_field_data = bytes(bits.read_bytes(comment_field_bytes * 8))
         return obj
 
+    def encode(self, bits: BitWriter) -> None:
+        # byte_align() is relative to the beginning of bits, which must be
+        # where the ASC starts (see AudioSpecificConfig.encode())
+        bits.write(self.element_instance_tag, 4)
+        bits.write(self.object_type, 2)
+        bits.write(self.sampling_frequency_index, 4)
+
+        bits.write(len(self.front_channel_elements), 4)
+        bits.write(len(self.side_channel_elements), 4)
+        bits.write(len(self.back_channel_elements), 4)
+        bits.write(len(self.lfe_channel_elements), 2)
+        bits.write(len(self.assoc_data_elements), 3)
+        bits.write(len(self.valid_cc_elements), 4)
+
+        for number in (self.mono_mixdown_element_number, self.stereo_mixdown_element_number):
+            bits.write(number is not None, 1)
+            if number is not None:
+                bits.write(number, 4)
+
+        bits.write(self.matrix_mixdown is not None, 1)
+        if self.matrix_mixdown is not None:
+            self.matrix_mixdown.encode(bits)
+
+        for elements in (self.front_channel_elements, self.side_channel_elements, self.back_channel_elements):
+            for element in elements:
+                element.encode(bits, True)
+
+        for elements in (self.lfe_channel_elements, self.assoc_data_elements):
+            for element in elements:
+                element.encode(bits, False)
+
+        for element in self.valid_cc_elements:
+            element.encode(bits)
+
+        bits.byte_align()
+        bits.write(len(self.comment_field_data), 8)
+        bits.write_bytes(self.comment_field_data)
+
 
 sampling_frequency_table : list[int] = [ 96000,88200,64000,48000,44100,32000,24000,22050,16000,12000,11025,8000,7350,0,0 ]
 
@@ -140,6 +193,17 @@ class Format:
         else:
             self.sampling_frequency = bits.read(24)
 
+    def encode_sampling_frequency(self, bits: BitWriter) -> None:
+        bits.write(self.sampling_frequency_index, 4)
+        if self.sampling_frequency_index == 0xf:
+            bits.write(self.sampling_frequency, 24)
+
+    @property
+    def sample_rate(self) -> int:
+        if self.sampling_frequency_index == 0xf:
+            return self.sampling_frequency
+        return sampling_frequency_table[self.sampling_frequency_index]
+
 
 @dataclass(eq=True, slots=True)
 class BSACExtension:
@@ -200,6 +264,21 @@ class GASpecificConfig:
             obj.extension_flag3 = bits.read(1)
         return obj
 
+    def encode(self, bits: BitWriter, format: Format) -> None:
+        if self.extension_flag:
+            raise NotImplementedError('encoding of GASpecificConfig extension is unsupported')
+        bits.write(self.frame_length_flag, 1)
+        bits.write(self.depends_on_core_coder, 1)
+        if self.depends_on_core_coder:
+            bits.write(self.core_coder_delay, 14)
+        bits.write(self.extension_flag, 1)
+        if format.channel_configuration == 0:
+            if self.program_config_elment is None:
+                raise ValueError('GASpecificConfig: channel_configuration 0 needs a program_config_element')
+            self.program_config_elment.encode(bits)
+        if format.audio_object_type in (6, 20):
+            bits.write(self.layer_nr, 3)
+
 
 @dataclass(eq=True, slots=True)
 class SBRHeaderExtra1:
@@ -312,7 +391,8 @@ class ELDSpecificConfig(ERExtension):
                 eld_ext_len += eld_ext_len_add
                 if eld_ext_len_add == 0xff:
                     eld_ext_len += bits.read(16)
-            ext_bytes = bits.read_bytes(eld_ext_len)
+            # copied, like PCE comments
+            ext_bytes = bytes(bits.read_bytes(eld_ext_len * 8))
             obj.extensions.append((eld_ext_type, ext_bytes))
         return obj
 
@@ -324,6 +404,14 @@ def decode_audio_object_type(bits: BitReader) -> int:
     return aot
 
 
+def encode_audio_object_type(bits: BitWriter, aot: int) -> None:
+    if aot < 31:
+        bits.write(aot, 5)
+    else:
+        bits.write(31, 5)
+        bits.write(aot - 32, 6)
+
+
 @dataclass(eq=True, slots=True)
 class AudioSpecificConfig:
     format: Format = field(default_factory=Format)
@@ -335,8 +423,8 @@ class AudioSpecificConfig:
 
     @classmethod
     def decode(cls, bits: BitReader, bits_to_decode: int=0) -> AudioSpecificConfig:
-        # Since PCE needs byte_align() relative to the beginning of ASC, we need new BitStream
-        bits1 = BitReader(bits.tobytes())
+        # Since PCE needs byte_align() relative to the beginning of ASC, we need a child reader
+        bits1 = bits.child()
         obj = AudioSpecificConfig()
         obj.format.audio_object_type = decode_audio_object_type(bits1)
         obj.format.decode_sampling_frequency(bits1)
@@ -383,6 +471,47 @@ class AudioSpecificConfig:
         else:
             bits.skip(bits1.tell())
         return obj
+
+    def encode(self, bits: BitWriter) -> None:
+        # GA object types only; SBR/PS are signalled explicitly
+        # (hierarchical), as decode() reads them back
+        if self.format.channel_configuration == 0:
+            # PCE needs byte_align() relative to the beginning of ASC, so
+            # encode into a writer of its own and copy the bits over
+            write_bits(bits, *serialize_bits(self._encode))
+        else:
+            self._encode(bits)
+
+    def _encode(self, bits: BitWriter) -> None:
+        if self.format.audio_object_type not in (1, 2, 3, 4, 6, 7, 17, 19, 20, 21, 22, 23):
+            raise NotImplementedError(f"encoding of AOT {self.format.audio_object_type} is unsupported")
+        if self.sbr_present_flag == 1:
+            encode_audio_object_type(bits, 29 if self.ps_present_flag == 1 else 5)
+            self.format.encode_sampling_frequency(bits)
+            bits.write(self.format.channel_configuration, 4)
+            self.extension_format.encode_sampling_frequency(bits)
+            encode_audio_object_type(bits, self.format.audio_object_type)
+            if self.format.audio_object_type == 22:
+                bits.write(self.extension_format.channel_configuration, 4)
+        else:
+            encode_audio_object_type(bits, self.format.audio_object_type)
+            self.format.encode_sampling_frequency(bits)
+            bits.write(self.format.channel_configuration, 4)
+        self.codec_specific_config.encode(bits, self.format)
+        if self.format.audio_object_type in (17, 19, 20, 21, 22, 23):
+            bits.write(self.ep_config, 2)
+
+    @classmethod
+    def from_format(cls, format: Format, frame_length_flag: int=0) -> AudioSpecificConfig:
+        obj = AudioSpecificConfig()
+        obj.format = Format(audio_object_type=format.audio_object_type,
+                            channel_configuration=format.channel_configuration,
+                            sampling_frequency_index=format.sampling_frequency_index,
+                            sampling_frequency=format.sampling_frequency)
+        obj.codec_specific_config = GASpecificConfig(frame_length_flag=frame_length_flag)
+        if format.audio_object_type in (17, 19, 20, 21, 22, 23):
+            obj.ep_config = 0
+        return obj
     
     @property
     def num_samples_per_frame(self) -> int:
@@ -0,0 +1,27 @@
+from __future__ import annotations
+from collections.abc import ByteString
+
+__all__ = [ 'check_range', 'extract_bits', 'extract_bytes' ]
+
+# helpers shared by the BitReader backends; positions are in bits from the
+# start of data. reading past the end of data is a ValueError in every
+# backend, never zero padding
+
+def check_range(size: int, pos: int, nbits: int) -> None:
+    if pos + nbits > size:
+        raise ValueError(f'read past the end of data: {nbits} bits at bit {pos} of {size}')
+
+def extract_bits(data: ByteString, pos: int, nbits: int) -> int:
+    end = pos + nbits
+    check_range(len(data) * 8, pos, nbits)
+    value = int.from_bytes(data[pos >> 3:(end + 7) >> 3], 'big')
+    return (value >> (-end & 7)) & ((1 << nbits) - 1)
+
+def extract_bytes(data: ByteString, pos: int, nbits: int) -> ByteString:
+    if not (pos | nbits) & 7:
+        check_range(len(data) * 8, pos, nbits)
+        # byte aligned: a plain slice, zero-copy when data is a memoryview
+        return data[pos >> 3:(pos + nbits) >> 3]
+    # not aligned: shift the whole span in one go; the rest of a partial
+    # last byte is filled with zeros
+    return (extract_bits(data, pos, nbits) << (-nbits & 7)).to_bytes((nbits + 7) >> 3, 'big')
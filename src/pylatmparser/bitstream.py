@@ -1,6 +1,62 @@
-try:
-    from .bitstream_flac import BitReader, BitWriter
-except:
-    from .bitstream_bitarray import BitReader, BitWriter
+from __future__ import annotations
+from types import ModuleType
+from typing import Callable
+import importlib
+import os
 
-__all__ = [ 'BitReader', 'BitWriter' ]
+# in order of preference; PYLATMPARSER_BITSTREAM=<name> forces one
+BACKENDS = ('flac', 'int', 'bitarray')
+BACKEND_ENV = 'PYLATMPARSER_BITSTREAM'
+
+def load_backend(name: str) -> ModuleType:
+    if name not in BACKENDS:
+        raise ValueError(f'unknown bitstream backend: {name} (choose from {", ".join(BACKENDS)})')
+    return importlib.import_module(f'.bitstream_{name}', __package__)
+
+def available_backends() -> list[str]:
+    names = []
+    for name in BACKENDS:
+        try:
+            load_backend(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+def _select_backend() -> tuple[str, ModuleType]:
+    name = os.environ.get(BACKEND_ENV)
+    if name:
+        return name, load_backend(name)
+    for name in BACKENDS:
+        try:
+            return name, load_backend(name)
+        except ImportError:
+            continue
+    raise ImportError('no bitstream backend available')
+
+BACKEND, _backend = _select_backend()
+BitReader = _backend.BitReader
+BitWriter = _backend.BitWriter
+
+def serialize_bits(encode: Callable[[BitWriter], None]) -> tuple[int, int]:
+    # (value, number of bits) of what encode() writes into a writer of its
+    # own, without the padding tobytes() adds: a 1 bit is appended to mark
+    # the end
+    bits = BitWriter()
+    encode(bits)
+    bits.write(1, 1)
+    data = bits.tobytes()
+    value = int.from_bytes(data, 'big')
+    trailing = (value & -value).bit_length()
+    return value >> trailing, len(data) * 8 - trailing
+
+def write_bits(bits: BitWriter, value: int, nbits: int) -> None:
+    # write() of any width, in pieces of at most 32 bits as every backend
+    # takes them
+    while nbits > 32:
+        nbits -= 32
+        bits.write(value >> nbits & 0xffffffff, 32)
+    if nbits:
+        bits.write(value & (1 << nbits) - 1, nbits)
+
+__all__ = [ 'BitReader', 'BitWriter', 'BACKEND', 'available_backends', 'load_backend', 'serialize_bits', 'write_bits' ]
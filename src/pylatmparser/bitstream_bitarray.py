@@ -1,31 +1,65 @@
+from __future__ import annotations
 from collections.abc import ByteString
 from bitarray import bitarray
 from bitarray.util import ba2int, int2ba
+from .bitops import check_range
 
 __all__ = [ 'BitReader', 'BitWriter' ]
 
 class BitReader:
     def __init__(self, data: ByteString):
-        self.bits = bitarray()
-        self.bits.frombytes(data)
+        # share the caller's buffer instead of copying it
+        self.data = data
+        self.bits = bitarray(buffer=data, endian='big')
+        self.size = len(self.bits)
         self.pos = 0
+        # tell() and byte_align() are relative to origin (see child())
+        self.origin = 0
+
+    def child(self) -> BitReader:
+        # reader sharing data and starting at the current position, with its
+        # own alignment origin; the parent is not advanced
+        obj = BitReader.__new__(BitReader)
+        obj.data = self.data
+        obj.bits = self.bits
+        obj.size = self.size
+        obj.pos = self.pos
+        obj.origin = self.pos
+        return obj
     
     def read(self, nbits: int) -> int:
+        if self.pos + nbits > self.size:
+            check_range(self.size, self.pos, nbits)
         value = ba2int(self.bits[self.pos:self.pos+nbits])
         self.pos += nbits
         return value
 
+    def peek(self, nbits: int, pos: int | None = None) -> int:
+        pos = self.pos if pos is None else self.origin + pos
+        check_range(self.size, pos, nbits)
+        return ba2int(self.bits[pos:pos+nbits])
+
     def tell(self) -> int:
-        return self.pos
+        return self.pos - self.origin
+
+    def bits_left(self) -> int:
+        return len(self.bits) - self.pos
     
     def skip(self, len: int) -> None:
+        if self.pos + len > self.size:
+            check_range(self.size, self.pos, len)
         self.pos += len
     
     def byte_align(self) -> None:
-        self.pos = ((self.pos + 7) // 8) * 8
+        self.skip(-(self.pos - self.origin) & 7)
     
-    def read_bytes(self, nbits: int) -> bytes:
-        value = self.bits[self.pos:self.pos+nbits].tobytes()
+    def read_bytes(self, nbits: int) -> ByteString:
+        check_range(self.size, self.pos, nbits)
+        if not (self.pos | nbits) & 7:
+            # byte aligned: slice the source (zero-copy for memoryview input)
+            value = self.data[self.pos >> 3:(self.pos + nbits) >> 3]
+        else:
+            value = self.bits[self.pos:self.pos+nbits].tobytes()
         self.pos += nbits
         return value
     
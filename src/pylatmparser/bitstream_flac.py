@@ -1,4 +1,7 @@
+from __future__ import annotations
 from collections.abc import ByteString
+from .bitops import extract_bits, extract_bytes
+from .bitstream_int import BitReader as IntBitReader
 from flac_bitstream import BitReader as FLAC_BitReader
 from flac_bitstream import BitWriter as FLAC_BitWriter
 import sys
@@ -7,14 +10,30 @@ __all__ = [ 'BitReader', 'BitWriter' ]
 
 class BitReader:
     def __init__(self, data: ByteString):
-        self.data = bytes(data[:])
-        self.bits = FLAC_BitReader(self.data)
+        self.data = data
+        # flac_bitstream needs its own bytes; memoryviews (mmap input) are
+        # copied, bytes are passed through
+        self.bits = FLAC_BitReader(data if type(data) is bytes else bytes(data))
     
+    def child(self) -> IntBitReader:
+        # reader starting at the current position, with its own alignment
+        # origin; the parent is not advanced. flac_bitstream aligns relative to
+        # the start of its buffer, so instead of copying the rest of the data
+        # into a new one, the child is an int backend reader over the same
+        # data. children only decode AudioSpecificConfigs, which are short.
+        return IntBitReader(self.data, self.tell())
+
     def read(self, nbits: int) -> int:
         return self.bits.read_bits(nbits)
 
+    def peek(self, nbits: int, pos: int | None = None) -> int:
+        return extract_bits(self.data, self.tell() if pos is None else pos, nbits)
+
     def tell(self) -> int:
         return len(self.data) * 8 - self.bits.get_input_bits_unconsumed()
+
+    def bits_left(self) -> int:
+        return self.bits.get_input_bits_unconsumed()
     
     def skip(self, len: int) -> None:
         if len > 0:
@@ -24,14 +43,13 @@ class BitReader:
         n = self.bits.bits_left_for_byte_alignment()
         self.bits.skip_bits(n)
     
-    def read_bytes(self, nbits: int) -> bytes:
-        if nbits > 0:
-            buf = bytearray((nbits + 7) // 8)
-            self.bits.read_byte_block(buf)
-        return buf
+    def read_bytes(self, nbits: int) -> ByteString:
+        value = extract_bytes(self.data, self.tell(), nbits)
+        self.skip(nbits)
+        return value
     
     def tobytes(self) -> bytes:
-        bits = FLAC_BitReader(self.data + b'\0')
+        bits = FLAC_BitReader(bytes(self.data) + b'\0')
         n = self.tell()
         bits.skip_bits(n)
         ba = bytearray(len(self.data) - n // 8)
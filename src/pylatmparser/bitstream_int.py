@@ -0,0 +1,141 @@
+from __future__ import annotations
+from collections.abc import ByteString
+from .bitops import check_range, extract_bits, extract_bytes
+
+__all__ = [ 'BitReader', 'BitWriter' ]
+
+# bytes loaded into the bit cache at a time
+CACHE_BYTES = 8
+
+class BitReader:
+    # plain int backend: the bits following the read position are cached in an
+    # int; fields are taken out of it with shift and mask
+    def __init__(self, data: ByteString, origin: int = 0):
+        self.data = data
+        self.size = len(data) * 8
+        # data[:cache_end // 8] has been loaded; the low `avail` bits of cache
+        # are the ones not read yet
+        self.cache = 0
+        self.avail = 0
+        self.cache_end = 0
+        # tell() and byte_align() are relative to origin (see child()); a
+        # reader made with origin > 0 starts reading there
+        self.origin = origin
+        if origin:
+            check_range(self.size, origin, 0)
+            self._seek(origin)
+
+    def child(self) -> BitReader:
+        # reader sharing data and starting at the current position, with its
+        # own alignment origin; the parent is not advanced
+        obj = BitReader.__new__(BitReader)
+        obj.data = self.data
+        obj.size = self.size
+        obj.cache = self.cache
+        obj.avail = self.avail
+        obj.cache_end = self.cache_end
+        obj.origin = self.cache_end - self.avail
+        return obj
+
+    def _refill(self, nbits: int) -> None:
+        # only real data goes into the cache, so that read() never needs to
+        # check against the end of it
+        avail = self.avail
+        nbytes = max(CACHE_BYTES, (nbits - avail + 7) >> 3)
+        byte = self.cache_end >> 3
+        chunk = self.data[byte:byte + nbytes]
+        if avail + len(chunk) * 8 < nbits:
+            check_range(self.size, self.cache_end - avail, nbits)
+        self.cache = (self.cache & ((1 << avail) - 1)) << (len(chunk) * 8) | int.from_bytes(chunk, 'big')
+        self.avail = avail + len(chunk) * 8
+        self.cache_end += len(chunk) * 8
+
+    def _seek(self, pos: int) -> None:
+        self.cache = 0
+        self.avail = 0
+        self.cache_end = pos & ~7
+        if pos & 7:
+            self._refill(8)
+            self.avail -= pos & 7
+
+    def read(self, nbits: int) -> int:
+        if nbits > self.avail:
+            self._refill(nbits)
+        self.avail -= nbits
+        return self.cache >> self.avail & ((1 << nbits) - 1)
+
+    def peek(self, nbits: int, pos: int | None = None) -> int:
+        if pos is None:
+            pos = self.cache_end - self.avail
+        else:
+            pos += self.origin
+        return extract_bits(self.data, pos, nbits)
+
+    def tell(self) -> int:
+        return self.cache_end - self.avail - self.origin
+
+    def bits_left(self) -> int:
+        return self.size - (self.cache_end - self.avail)
+
+    def skip(self, len: int) -> None:
+        if len <= self.avail:
+            self.avail -= len
+        else:
+            pos = self.cache_end - self.avail
+            check_range(self.size, pos, len)
+            self._seek(pos + len)
+
+    def byte_align(self) -> None:
+        self.skip(-self.tell() & 7)
+
+    def read_bytes(self, nbits: int) -> ByteString:
+        value = extract_bytes(self.data, self.cache_end - self.avail, nbits)
+        self.skip(nbits)
+        return value
+
+    def tobytes(self) -> bytes:
+        pos = self.cache_end - self.avail
+        return bytes(extract_bytes(self.data, pos, self.size - pos))
+
+    def latm_get_value(self) -> int:
+        bytes_for_value = self.read(2)
+        value = 0
+        for _ in range(bytes_for_value):
+            value <<= 8
+            value_tmp = self.read(8)
+            value |= value_tmp
+        return value
+
+class BitWriter:
+    def __init__(self):
+        self.buf = bytearray()
+        # pending bits, fewer than 8
+        self.acc = 0
+        self.acc_bits = 0
+
+    def write(self, value: int, nbits: int) -> None:
+        if value >> nbits:
+            raise OverflowError(f'{value} does not fit in {nbits} bits')
+        acc = self.acc << nbits | value
+        acc_bits = self.acc_bits + nbits
+        if acc_bits >= 8:
+            nbytes = acc_bits >> 3
+            acc_bits &= 7
+            self.buf += (acc >> acc_bits).to_bytes(nbytes, 'big')
+            acc &= (1 << acc_bits) - 1
+        self.acc = acc
+        self.acc_bits = acc_bits
+
+    def byte_align(self) -> None:
+        if self.acc_bits:
+            self.write(0, 8 - self.acc_bits)
+
+    def write_bytes(self, data: ByteString) -> None:
+        if not self.acc_bits:
+            self.buf += data
+        elif data:
+            self.write(int.from_bytes(data, 'big'), len(data) * 8)
+
+    def tobytes(self) -> bytes:
+        self.byte_align()
+        return bytes(self.buf)
@@ -0,0 +1,198 @@
+from __future__ import annotations
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from typing import IO
+import os
+import struct
+import sys
+from .bitstream import BitReader
+from .latm import StreamMuxConfig, StreamMuxConfigCache, AudioMuxElement, loas_frames, _scan_lazy_elements
+from .adts import adts_frames
+
+__all__ = [ 'FrameIndex', 'sidecar_path' ]
+
+# magic, version, kind, source size, source mtime_ns, frame count, config count, end position
+INDEX_HEADER = struct.Struct('<4sHH QQ II Q')
+INDEX_MAGIC = b'LIDX'
+INDEX_VERSION = 2
+INDEX_KINDS = ('loas', 'adts')
+# positions are integer ticks of 1/705600000 s: every AAC sampling rate
+# divides it, so frame positions add up exactly and don't drift like a sum
+# of float durations would
+TIMEBASE = 705600000
+
+
+def sidecar_path(path: str | os.PathLike) -> str:
+    return os.fspath(path) + '.idx'
+
+
+def _frame_ticks(num_samples: int, sample_rate: int | None) -> int:
+    # 0 if unknown
+    if not num_samples or not sample_rate:
+        return 0
+    return num_samples * TIMEBASE // sample_rate
+
+
+def _source_stat(path: str | os.PathLike) -> tuple[int, int]:
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+@dataclass(eq=True, slots=True)
+class FrameIndex:
+    kind: str = 'loas'
+    source_size: int = 0
+    source_mtime_ns: int = 0
+    # per frame: byte offset, length (including sync header), config generation, position in TIMEBASE ticks
+    offsets: array = field(default_factory=lambda: array('Q'))
+    lengths: array = field(default_factory=lambda: array('H'))
+    generations: array = field(default_factory=lambda: array('I'))
+    positions: array = field(default_factory=lambda: array('Q'))
+    # per config generation: offset of the frame carrying it
+    config_offsets: array = field(default_factory=lambda: array('Q'))
+    # position after the last frame
+    end: int = 0
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    @property
+    def duration(self) -> float:
+        return self.end / TIMEBASE
+
+    def pts(self, frame: int) -> float:
+        # start of a frame in seconds
+        return self.positions[frame] / TIMEBASE
+
+    def _append(self, offset: int, length: int, generation: int, ticks: int) -> None:
+        self.offsets.append(offset)
+        self.lengths.append(length)
+        self.generations.append(generation)
+        self.positions.append(self.end)
+        self.end += ticks
+
+    @classmethod
+    def build_loas(cls, fp: IO[bytes]) -> FrameIndex:
+        obj = FrameIndex(kind='loas')
+        for offset, size, _, stream_mux_config, changed in _scan_lazy_elements(loas_frames(fp)):
+            if changed:
+                obj.config_offsets.append(offset)
+            if stream_mux_config is None:
+                # nothing can be decoded before the first StreamMuxConfig
+                continue
+            asc = stream_mux_config.streams[0].audio_specific_config
+            ticks = _frame_ticks(stream_mux_config.num_sub_frames * asc.num_samples_per_frame, asc.format.sample_rate)
+            obj._append(offset, size, len(obj.config_offsets) - 1, ticks)
+        return obj
+
+    @classmethod
+    def build_adts(cls, fp: IO[bytes]) -> FrameIndex:
+        obj = FrameIndex(kind='adts')
+        fixed_header: tuple[int, int, int] | None = None
+        for offset, hdr, _ in adts_frames(fp):
+            key = hdr.format_key
+            if key != fixed_header:
+                obj.config_offsets.append(offset)
+                fixed_header = key
+            ticks = _frame_ticks(1024 * (hdr.number_of_raw_data_blocks_in_frame + 1), hdr.sample_rate)
+            obj._append(offset, hdr.aac_frame_length, len(obj.config_offsets) - 1, ticks)
+        return obj
+
+    @classmethod
+    def build(cls, path: str | os.PathLike, kind: str) -> FrameIndex:
+        if kind not in INDEX_KINDS:
+            raise ValueError(f'unknown index kind: {kind}')
+        source_size, source_mtime_ns = _source_stat(path)
+        with open(path, 'rb') as fp:
+            obj = cls.build_loas(fp) if kind == 'loas' else cls.build_adts(fp)
+        obj.source_size = source_size
+        obj.source_mtime_ns = source_mtime_ns
+        return obj
+
+    @classmethod
+    def for_file(cls, path: str | os.PathLike, kind: str, save: bool = False) -> FrameIndex:
+        # use the sidecar if it is up to date, otherwise index the file
+        sidecar = sidecar_path(path)
+        if os.path.exists(sidecar):
+            try:
+                obj = cls.load(sidecar)
+            except ValueError:
+                # truncated, or written by another version: rebuilt below
+                obj = None
+            if obj is not None and obj.kind == kind and (obj.source_size, obj.source_mtime_ns) == _source_stat(path):
+                return obj
+        obj = cls.build(path, kind)
+        if save:
+            try:
+                obj.save(sidecar)
+            except OSError:
+                # read-only location: the index is still good for this call
+                pass
+        return obj
+
+    @classmethod
+    def for_stream(cls, fp: IO[bytes], kind: str) -> FrameIndex:
+        # the index used for a time range when none is given: the sidecar of
+        # fp's file, written on first use so that later calls don't parse the
+        # whole file again
+        path = getattr(fp, 'name', None)
+        if not isinstance(path, (str, os.PathLike)):
+            raise ValueError('start_time/end_time need index= for inputs without a file name')
+        return cls.for_file(path, kind, save=True)
+
+    def save(self, path: str | os.PathLike) -> None:
+        columns = (self.offsets, self.lengths, self.generations, self.positions, self.config_offsets)
+        with open(path, 'wb') as fp:
+            fp.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, INDEX_KINDS.index(self.kind),
+                                       self.source_size, self.source_mtime_ns,
+                                       len(self.offsets), len(self.config_offsets), self.end))
+            for column in columns:
+                if sys.byteorder == 'big':
+                    column = array(column.typecode, column)
+                    column.byteswap()
+                column.tofile(fp)
+
+    @classmethod
+    def load(cls, path: str | os.PathLike) -> FrameIndex:
+        with open(path, 'rb') as fp:
+            header = fp.read(INDEX_HEADER.size)
+            if len(header) != INDEX_HEADER.size:
+                raise ValueError(f'{path}: truncated index')
+            magic, version, kind, source_size, source_mtime_ns, count, config_count, end = INDEX_HEADER.unpack(header)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION or kind >= len(INDEX_KINDS):
+                raise ValueError(f'{path}: not a frame index')
+            obj = FrameIndex(kind=INDEX_KINDS[kind], source_size=source_size, source_mtime_ns=source_mtime_ns,
+                             end=end)
+            columns = (obj.offsets, obj.lengths, obj.generations, obj.positions, obj.config_offsets)
+            for column, n in zip(columns, (count, count, count, count, config_count)):
+                try:
+                    column.fromfile(fp, n)
+                except EOFError:
+                    raise ValueError(f'{path}: truncated index') from None
+                if sys.byteorder == 'big':
+                    column.byteswap()
+        return obj
+
+    def frame_range(self, start_time: float | None, end_time: float | None) -> tuple[int, int]:
+        # frames overlapping [start_time, end_time); times are rounded to the
+        # nearest tick, so a time computed from frame durations hits the frame
+        # boundary exactly
+        first = 0
+        if start_time is not None:
+            first = max(bisect_right(self.positions, round(start_time * TIMEBASE)) - 1, 0)
+        last = len(self.positions)
+        if end_time is not None:
+            last = bisect_left(self.positions, round(end_time * TIMEBASE))
+        return first, last
+
+    def read_stream_mux_config(self, fp: IO[bytes], frame: int,
+                               config_cache: StreamMuxConfigCache | None = None) -> StreamMuxConfig:
+        # decode the StreamMuxConfig in effect at the given frame
+        if self.kind != 'loas':
+            raise ValueError('StreamMuxConfig is only available for LOAS')
+        offset = self.config_offsets[self.generations[frame]]
+        fp.seek(offset)
+        data = fp.read(self.lengths[bisect_left(self.offsets, offset)])
+        element = AudioMuxElement.decode(BitReader(data[3:]), None, True, config_cache)
+        return element.stream_mux_config
@@ -1,11 +1,20 @@
 from __future__ import annotations
+from collections import OrderedDict
 from collections.abc import ByteString
 from dataclasses import dataclass, field
-from typing import IO, Iterable
-from .bitstream import BitReader
-from .asc import AudioSpecificConfig
+from typing import IO, AsyncIterator, Callable, Iterable, Iterator, TYPE_CHECKING
+import itertools
+import mmap
+import os
+import time
+from .bitstream import BitReader, BitWriter
+from .asc import AudioSpecificConfig, Format
+from .stats import ParseStats, _end_offset
+if TYPE_CHECKING:
+    import asyncio
+    from .index import FrameIndex
 
-__all__ = ['Stream', 'StreamMuxConfig', 'LatmPacket', 'AudioMuxElement', 'audio_sync_stream']
+__all__ = ['Stream', 'StreamMuxConfig', 'StreamMuxConfigCache', 'LatmPacket', 'AudioMuxElement', 'LazyAudioMuxElement', 'LatmDecoder', 'loas_frames', 'loas_buffer_frames', 'find_loas_sync', 'audio_sync_stream', 'audio_sync_stream_async', 'audio_sync_stream_mmap']
 
 @dataclass(eq=True, slots=True)
 class Stream:
@@ -98,22 +107,115 @@ class StreamMuxConfig:
             obj.crc_check_sum = bits.read(8)
         return obj
 
+    def encode(self, bits: BitWriter) -> None:
+        if self.audio_mux_version != 0:
+            raise NotImplementedError(f"encoding of audioMuxVersion {self.audio_mux_version} is unsupported")
+        bits.write(self.audio_mux_version, 1)
+        bits.write(self.all_streams_same_time_framing, 1)
+        bits.write(self.num_sub_frames - 1, 6)
+        bits.write(self.num_program - 1, 4)
+        prev: Stream | None = None
+        for prog in range(self.num_program):
+            layers = [stream for stream in self.streams if stream.program == prog]
+            bits.write(len(layers) - 1, 3)
+            for stream in layers:
+                if prev is not None:
+                    use_same_config = stream.audio_specific_config == prev.audio_specific_config
+                    bits.write(use_same_config, 1)
+                else:
+                    use_same_config = False
+                if not use_same_config:
+                    stream.audio_specific_config.encode(bits)
+                bits.write(stream.frame_length_type, 3)
+                if stream.frame_length_type != 0:
+                    raise NotImplementedError(f"unsupported frame_length_type: {stream.frame_length_type}")
+                bits.write(stream.latm_buffer_fullness, 8)
+                if stream.core_frame_offset is not None:
+                    bits.write(stream.core_frame_offset, 6)
+                prev = stream
+
+        bits.write(self.other_data_present, 1)
+        if self.other_data_present:
+            nbytes = max((self.other_data_len_bits.bit_length() + 7) // 8, 1)
+            for i in reversed(range(nbytes)):
+                bits.write(1 if i else 0, 1)
+                bits.write(self.other_data_len_bits >> i * 8 & 0xff, 8)
+        bits.write(self.crc_check_present, 1)
+        if self.crc_check_present:
+            bits.write(self.crc_check_sum, 8)
+
+    @classmethod
+    def from_format(cls, format: Format, frame_length_flag: int=0) -> StreamMuxConfig:
+        # single program, single layer config for one AAC stream, as carried by ADTS
+        stream = Stream(audio_specific_config=AudioSpecificConfig.from_format(format, frame_length_flag),
+                        latm_buffer_fullness=0xff)
+        return StreamMuxConfig(all_streams_same_time_framing=1, num_sub_frames=1, num_program=1, streams=[stream])
+
+    @property
+    def frame_duration(self) -> float:
+        # duration of an AudioMuxElement in seconds, 0.0 if unknown
+        asc = self.streams[0].audio_specific_config
+        num_samples = asc.num_samples_per_frame
+        sample_rate = asc.format.sample_rate
+        if not num_samples or not sample_rate:
+            return 0.0
+        return self.num_sub_frames * num_samples / sample_rate
+
+
+class StreamMuxConfigCache:
+    # StreamMuxConfig is usually repeated verbatim in every AudioMuxElement.
+    # Decoded configs are remembered by their raw bits, so that an identical
+    # config is recognized by a single comparison and the same object reused.
+    def __init__(self, maxsize: int=8):
+        self.maxsize = maxsize
+        self.entries: OrderedDict[tuple[int, int], StreamMuxConfig] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def decode(self, bits: BitReader) -> StreamMuxConfig:
+        bits_left = bits.bits_left()
+        for key in reversed(self.entries):
+            nbits, value = key
+            if nbits <= bits_left and bits.peek(nbits) == value:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                bits.skip(nbits)
+                return self.entries[key]
+        self.misses += 1
+        pos = bits.tell()
+        obj = StreamMuxConfig.decode(bits)
+        nbits = bits.tell() - pos
+        self.entries[(nbits, bits.peek(nbits, pos))] = obj
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return obj
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def decode_mux_slot_length_bytes(bits: BitReader, stream: Stream) -> int:
+    if stream.frame_length_type != 0:
+        raise NotImplementedError(f"unsupported frame_length_type: {stream.frame_length_type}")
+    mux_slot_length_bytes = 0
+    while True:
+        tmp = bits.read(8)
+        mux_slot_length_bytes += tmp
+        if tmp != 0xff: break
+    return mux_slot_length_bytes
+
 
 @dataclass(eq=True, slots=True)
 class LatmPacket:
     stream_id: int = 0
     mux_slot_length_bytes: int = 0
     au_end_flag: int | None = None
-    payload: bytes = b''
+    payload: bytes | memoryview = b''
 
     def decode_length_info(self, bits: BitReader, stream: Stream, has_end_flags: bool) -> None:
-        if stream.frame_length_type != 0:
-            raise NotImplementedError(f"unsupported frame_length_type: {stream.frame_length_type}")
-        self.mux_slot_length_bytes = 0
-        while True:
-            tmp = bits.read(8)
-            self.mux_slot_length_bytes += tmp
-            if tmp != 0xff: break
+        self.mux_slot_length_bytes = decode_mux_slot_length_bytes(bits, stream)
         if has_end_flags:
             self.au_end_flag = bits.read(1)
     
@@ -152,6 +254,34 @@ def decode_payload_mux(bits: BitReader, mc: StreamMuxConfig, packets: list[LatmP
             packets[stream_id].decode_payload(bits, mc.streams[stream_id])
 
 
+def decode_sub_frames(bits: BitReader, mc: StreamMuxConfig) -> list[list[LatmPacket]]:
+    sub_frames = [[LatmPacket(stream_id=stream.id) for stream in mc.streams] for _ in range(mc.num_sub_frames)]
+    for packets in sub_frames:
+        payload_length_info = PayloadLengthInfo.decode(bits, mc, packets)
+        decode_payload_mux(bits, mc, packets, payload_length_info.chunk_stream)
+    return sub_frames
+
+
+def skip_sub_frame(bits: BitReader, mc: StreamMuxConfig) -> list[int]:
+    # PayloadLengthInfo() + PayloadMux() without building LatmPackets or
+    # touching the payload; returns mux_slot_length_bytes by stream id
+    lengths = [0] * len(mc.streams)
+    if mc.all_streams_same_time_framing:
+        for stream in mc.streams:
+            lengths[stream.id] = decode_mux_slot_length_bytes(bits, stream)
+        bits.skip(sum(lengths) * 8)
+    else:
+        chunk_stream = []
+        for _ in range(bits.read(4) + 1):
+            stream_id = bits.read(4)
+            chunk_stream.append(stream_id)
+            lengths[stream_id] = decode_mux_slot_length_bytes(bits, mc.streams[stream_id])
+            bits.skip(1)
+        for stream_id in chunk_stream:
+            bits.skip(lengths[stream_id] * 8)
+    return lengths
+
+
 @dataclass(eq=True, slots=True)
 class AudioMuxElement:
     stream_mux_config: StreamMuxConfig | None = None
@@ -160,52 +290,450 @@ class AudioMuxElement:
     other_data_bit: bytes | None = None
 
     @classmethod
-    def decode(cls, bits: BitReader, stream_mux_config: StreamMuxConfig, mux_config_present: bool) -> AudioMuxElement:
+    def decode(cls, bits: BitReader, stream_mux_config: StreamMuxConfig, mux_config_present: bool,
+               config_cache: StreamMuxConfigCache | None = None) -> AudioMuxElement:
         obj = AudioMuxElement()
         if mux_config_present:
             obj.use_same_stream_mux = bits.read(1)
             if not obj.use_same_stream_mux:
-                obj.stream_mux_config = StreamMuxConfig.decode(bits)
+                if config_cache is not None:
+                    obj.stream_mux_config = config_cache.decode(bits)
+                else:
+                    obj.stream_mux_config = StreamMuxConfig.decode(bits)
                 stream_mux_config = obj.stream_mux_config
         if not stream_mux_config:
-            return
+            return obj
         mc = stream_mux_config
         if mc.audio_mux_version_a != 0:
             raise NotImplementedError(f"unsupported audioMuxVersionA: {mc.audio_mux_version_a}")
-        obj.sub_frames = [[LatmPacket(stream_id=stream.id) for stream in mc.streams] for _ in range(mc.num_sub_frames)]
-        for i in range(mc.num_sub_frames):
-            payload_length_info = PayloadLengthInfo.decode(bits, mc, obj.sub_frames[i])
-            decode_payload_mux(bits, mc, obj.sub_frames[i], payload_length_info.chunk_stream)
+        obj.sub_frames = decode_sub_frames(bits, mc)
         if mc.other_data_present:
             obj.other_data_bit = bits.read(mc.other_data_len_bits)
         bits.byte_align()
         return obj
-    
 
-def resync(fp: IO[bytes], buf: memoryview) -> int:
-    if fp.readinto(buf[:2]) != 2:
-        return 0
-    word = buf[0]<<8 | buf[1]
+
+class LazyAudioMuxElement:
+    # AudioMuxElement for consumers that only need lengths and config: the
+    # payloads are skipped, and sub_frames is decoded from the frame data on
+    # first access
+    __slots__ = ('stream_mux_config', 'use_same_stream_mux', 'other_data_bit', 'payload_lengths',
+                 'data', 'config', 'payload_pos', '_sub_frames')
+
+    def __init__(self, data: ByteString):
+        self.stream_mux_config: StreamMuxConfig | None = None
+        self.use_same_stream_mux: int | None = None
+        self.other_data_bit: int | None = None
+        # mux_slot_length_bytes by sub frame and stream id
+        self.payload_lengths: list[list[int]] = []
+        self.data = data
+        # config in effect and where the first PayloadLengthInfo starts
+        self.config: StreamMuxConfig | None = None
+        self.payload_pos = 0
+        self._sub_frames: list[list[LatmPacket]] | None = None
+
+    @classmethod
+    def decode(cls, data: ByteString, stream_mux_config: StreamMuxConfig, mux_config_present: bool,
+               config_cache: StreamMuxConfigCache | None = None) -> LazyAudioMuxElement:
+        obj = LazyAudioMuxElement(data)
+        bits = BitReader(data)
+        if mux_config_present:
+            obj.use_same_stream_mux = bits.read(1)
+            if not obj.use_same_stream_mux:
+                if config_cache is not None:
+                    obj.stream_mux_config = config_cache.decode(bits)
+                else:
+                    obj.stream_mux_config = StreamMuxConfig.decode(bits)
+                stream_mux_config = obj.stream_mux_config
+        if not stream_mux_config:
+            obj._sub_frames = []
+            return obj
+        mc = stream_mux_config
+        if mc.audio_mux_version_a != 0:
+            raise NotImplementedError(f"unsupported audioMuxVersionA: {mc.audio_mux_version_a}")
+        obj.config = mc
+        obj.payload_pos = bits.tell()
+        obj.payload_lengths = [skip_sub_frame(bits, mc) for _ in range(mc.num_sub_frames)]
+        if mc.other_data_present:
+            obj.other_data_bit = bits.read(mc.other_data_len_bits)
+        return obj
+
+    @property
+    def sub_frames(self) -> list[list[LatmPacket]]:
+        if self._sub_frames is None:
+            bits = BitReader(self.data)
+            bits.skip(self.payload_pos)
+            self._sub_frames = decode_sub_frames(bits, self.config)
+        return self._sub_frames
+
+    @property
+    def payload_bytes(self) -> int:
+        return sum(map(sum, self.payload_lengths))
+
+    def materialize(self) -> AudioMuxElement:
+        return AudioMuxElement(stream_mux_config=self.stream_mux_config, sub_frames=self.sub_frames,
+                               use_same_stream_mux=self.use_same_stream_mux, other_data_bit=self.other_data_bit)
+
+    def __repr__(self) -> str:
+        return (f'LazyAudioMuxElement(stream_mux_config={self.stream_mux_config!r}, '
+                f'payload_lengths={self.payload_lengths!r}, use_same_stream_mux={self.use_same_stream_mux!r}, '
+                f'other_data_bit={self.other_data_bit!r})')
+
+
+LOAS_CHUNK_SIZE = 0x10000
+LOAS_MAX_FRAME_SIZE = 3 + 0x1fff
+
+def loas_frames(fp: IO[bytes], chunk_size: int=LOAS_CHUNK_SIZE) -> Iterator[tuple[int, memoryview]]:
+    # yields (file offset, AudioMuxElement bytes) for each AudioSyncStream frame.
+    # the view points into a reused buffer and is only valid until the next frame.
+    buf = bytearray(max(chunk_size, LOAS_MAX_FRAME_SIZE))
+    view = memoryview(buf)
+    base = 0
+    pos = 0
+    end = 0
+    eof = False
     while True:
-        if not fp.readinto(buf[:1]):
-            return 0
-        word = (word << 8 | buf[0]) & 0xffffff
-        if word >> 13 != 0x2b7:
+        if end - pos < 3 or buf[pos] != 0x56:
+            pos = buf.find(b'\x56', pos, end)
+            if pos < 0:
+                pos = end
+        if end - pos >= 3:
+            if buf[pos + 1] & 0xe0 != 0xe0:
+                pos += 1
+                continue
+            frame_end = pos + 3 + ((buf[pos + 1] & 0x1f) << 8 | buf[pos + 2])
+            if frame_end <= end:
+                yield base + pos, view[pos + 3:frame_end]
+                pos = frame_end
+                continue
+        if eof:
+            return
+        # move the unconsumed tail to the front and refill
+        if pos:
+            buf[:end - pos] = buf[pos:end]
+            base += pos
+            end -= pos
+            pos = 0
+        n = fp.readinto(view[end:])
+        if not n:
+            eof = True
+        else:
+            end += n
+
+
+def loas_buffer_frames(buf: ByteString, start: int=0) -> Iterator[tuple[int, memoryview]]:
+    # same as loas_frames(), but over an in-memory buffer (bytes, mmap...).
+    # the views share memory with buf.
+    view = memoryview(buf)
+    end = len(buf)
+    pos = start
+    while True:
+        pos = buf.find(b'\x56', pos)
+        if pos < 0 or end - pos < 3:
+            return
+        if buf[pos + 1] & 0xe0 != 0xe0:
+            pos += 1
             continue
-        return word
+        frame_end = pos + 3 + ((buf[pos + 1] & 0x1f) << 8 | buf[pos + 2])
+        if frame_end > end:
+            return
+        yield pos, view[pos + 3:frame_end]
+        pos = frame_end
 
-def audio_sync_stream(fp: IO[bytes]) -> Iterable[AudioMuxElement]:
-    stream_mux_config: StreamMuxConfig | None = None
-    buf = memoryview(bytearray(0x2000))
+
+def _config_changed(config: StreamMuxConfig | None, stream_mux_config: StreamMuxConfig | None) -> bool:
+    # whether an element's config replaces the one in effect. the config
+    # cache hands out the same object for a repeated config, so identity
+    # settles most elements; equality catches one that was decoded anew
+    return config is not None and config is not stream_mux_config and config != stream_mux_config
+
+
+def _scan_lazy_elements(frames: Iterable[tuple[int, memoryview]], stream_mux_config: StreamMuxConfig | None = None,
+                        config_cache: StreamMuxConfigCache | None = None
+                        ) -> Iterator[tuple[int, int, LazyAudioMuxElement, StreamMuxConfig | None, bool]]:
+    # (offset, size, element, config in effect, whether the element changed
+    # it) for scanners that only need lengths and configs. the elements are
+    # lazy and configs copy the bytes they keep, so frames from a reused
+    # buffer (loas_frames()) needn't be copied, but the elements must not be
+    # kept past the next frame
+    if config_cache is None:
+        config_cache = StreamMuxConfigCache()
+    for offset, frame in frames:
+        element = LazyAudioMuxElement.decode(frame, stream_mux_config, True, config_cache)
+        changed = _config_changed(element.stream_mux_config, stream_mux_config)
+        if element.stream_mux_config is not None:
+            stream_mux_config = element.stream_mux_config
+        yield offset, len(frame) + 3, element, stream_mux_config, changed
+
+
+def find_loas_sync(buf: ByteString, pos: int=0, depth: int=3) -> int:
+    # offset of the first sync word at or after pos whose audioMuxLengthBytes
+    # chain lands on another sync word (or exactly on the end of buf) depth
+    # times in a row, -1 if there is none
+    end = len(buf)
     while True:
-        word = resync(fp, buf)
-        if word >> 13 != 0x2b7:
-            break
-        audio_mux_length_bytes = word & 0x1fff
-        if fp.readinto(buf[:audio_mux_length_bytes]) != audio_mux_length_bytes:
-            break
-        bs = BitReader(buf[:audio_mux_length_bytes])
-        audio_mux_element = AudioMuxElement.decode(bs, stream_mux_config, True)
+        pos = buf.find(b'\x56', pos)
+        if pos < 0:
+            return -1
+        p = pos
+        for _ in range(depth):
+            if end - p < 3 or buf[p] != 0x56 or buf[p + 1] & 0xe0 != 0xe0:
+                break
+            p += 3 + ((buf[p + 1] & 0x1f) << 8 | buf[p + 2])
+            if p == end:
+                return pos
+        else:
+            if end - p >= 2 and buf[p] == 0x56 and buf[p + 1] & 0xe0 == 0xe0:
+                return pos
+        pos += 1
+
+
+def _audio_mux_elements(frames: Iterable[tuple[int, memoryview]], copy: bool,
+                        config_cache: StreamMuxConfigCache | None,
+                        stream_mux_config: StreamMuxConfig | None = None,
+                        lazy: bool = False,
+                        stats: ParseStats | None = None,
+                        end: Callable[[], int] | None = None) -> Iterator[AudioMuxElement | LazyAudioMuxElement]:
+    # end (stats only) gives the offset of the end of input once frames is
+    # exhausted, so that garbage after the last frame counts as resync bytes
+    if config_cache is None:
+        config_cache = StreamMuxConfigCache()
+    if stats is not None:
+        return _audio_mux_elements_stats(frames, copy, config_cache, stream_mux_config, lazy, stats, end)
+    return _audio_mux_elements_plain(frames, copy, config_cache, stream_mux_config, lazy)
+
+
+def _audio_mux_elements_plain(frames: Iterable[tuple[int, memoryview]], copy: bool,
+                              config_cache: StreamMuxConfigCache,
+                              stream_mux_config: StreamMuxConfig | None,
+                              lazy: bool) -> Iterator[AudioMuxElement | LazyAudioMuxElement]:
+    for _, frame in frames:
+        # frames from loas_frames() live in a reused buffer, so detach them
+        data = bytes(frame) if copy else frame
+        if lazy:
+            audio_mux_element = LazyAudioMuxElement.decode(data, stream_mux_config, True, config_cache)
+        else:
+            audio_mux_element = AudioMuxElement.decode(BitReader(data), stream_mux_config, True, config_cache)
         if audio_mux_element.stream_mux_config:
             stream_mux_config = audio_mux_element.stream_mux_config
         yield audio_mux_element
+
+
+class _TimedConfigCache:
+    # StreamMuxConfigCache stand-in adding the decode time and the cache
+    # hits and misses to the stats
+    def __init__(self, config_cache: StreamMuxConfigCache, stats: ParseStats):
+        self.config_cache = config_cache
+        self.stats = stats
+
+    @property
+    def hits(self) -> int:
+        return self.config_cache.hits
+
+    @property
+    def misses(self) -> int:
+        return self.config_cache.misses
+
+    def clear(self) -> None:
+        self.config_cache.clear()
+
+    def decode(self, bits: BitReader) -> StreamMuxConfig:
+        config_cache = self.config_cache
+        stats = self.stats
+        hits, misses = config_cache.hits, config_cache.misses
+        start = time.perf_counter()
+        try:
+            return config_cache.decode(bits)
+        finally:
+            stats.times['config'] += time.perf_counter() - start
+            stats.config_cache_hits += config_cache.hits - hits
+            stats.config_cache_misses += config_cache.misses - misses
+
+
+def _decode_element_stats(data: ByteString, stream_mux_config: StreamMuxConfig | None, lazy: bool,
+                          config_cache: _TimedConfigCache, stats: ParseStats) -> AudioMuxElement | LazyAudioMuxElement:
+    # decode with the time outside StreamMuxConfig going to 'payload', and
+    # the config and frame counters updated
+    times = stats.times
+    config_time = times['config']
+    start = time.perf_counter()
+    try:
+        if lazy:
+            audio_mux_element = LazyAudioMuxElement.decode(data, stream_mux_config, True, config_cache)
+        else:
+            audio_mux_element = AudioMuxElement.decode(BitReader(data), stream_mux_config, True, config_cache)
+    except Exception:
+        stats.decode_errors += 1
+        raise
+    finally:
+        times['payload'] += time.perf_counter() - start - (times['config'] - config_time)
+    if _config_changed(audio_mux_element.stream_mux_config, stream_mux_config):
+        stats.config_changes += 1
+    stats.bytes_in += len(data) + 3
+    stats.tick()
+    return audio_mux_element
+
+
+def _audio_mux_elements_stats(frames: Iterable[tuple[int, memoryview]], copy: bool,
+                              config_cache: StreamMuxConfigCache,
+                              stream_mux_config: StreamMuxConfig | None,
+                              lazy: bool, stats: ParseStats,
+                              end: Callable[[], int] | None = None) -> Iterator[AudioMuxElement | LazyAudioMuxElement]:
+    # _audio_mux_elements_plain() with stats; offsets tell the bytes skipped
+    timed_cache = _TimedConfigCache(config_cache, stats)
+    expected = 0
+    for offset, frame in stats.timed(frames, 'sync'):
+        if offset > expected:
+            stats.resync_bytes += offset - expected
+        expected = offset + 3 + len(frame)
+        data = bytes(frame) if copy else frame
+        audio_mux_element = _decode_element_stats(data, stream_mux_config, lazy, timed_cache, stats)
+        if audio_mux_element.stream_mux_config:
+            stream_mux_config = audio_mux_element.stream_mux_config
+        yield audio_mux_element
+    if end is not None:
+        stats.resync_bytes += max(end() - expected, 0)
+
+
+def audio_sync_stream(fp: IO[bytes], chunk_size: int=LOAS_CHUNK_SIZE,
+                      config_cache: StreamMuxConfigCache | None = None,
+                      start_time: float | None = None, end_time: float | None = None,
+                      index: FrameIndex | None = None, lazy: bool = False,
+                      stats: ParseStats | None = None) -> Iterator[AudioMuxElement]:
+    # with lazy=True, LazyAudioMuxElements are yielded instead
+    if start_time is None and end_time is None:
+        end = _end_offset(fp) if stats is not None else None
+        return _audio_mux_elements(loas_frames(fp, chunk_size), True, config_cache, None, lazy, stats, end)
+    if index is None:
+        from .index import FrameIndex
+        index = FrameIndex.for_stream(fp, 'loas')
+    first, last = index.frame_range(start_time, end_time)
+    if first >= last:
+        return iter(())
+    stream_mux_config = index.read_stream_mux_config(fp, first, config_cache)
+    fp.seek(index.offsets[first])
+    frames = itertools.islice(loas_frames(fp, chunk_size), last - first)
+    return _audio_mux_elements(frames, True, config_cache, stream_mux_config, lazy, stats)
+
+
+class LatmDecoder:
+    # push-style AudioSyncStream decoder: feed() arbitrary pieces of the
+    # stream, then take the completed AudioMuxElements from frames()
+    def __init__(self, config_cache: StreamMuxConfigCache | None = None,
+                 stream_mux_config: StreamMuxConfig | None = None, lazy: bool = False,
+                 stats: ParseStats | None = None):
+        self.buf = bytearray()
+        # everything before pos is consumed or known not to contain a sync word
+        self.pos = 0
+        self.config_cache = config_cache if config_cache is not None else StreamMuxConfigCache()
+        self.stream_mux_config = stream_mux_config
+        # yield LazyAudioMuxElements
+        self.lazy = lazy
+        self.stats = stats
+        if stats is not None:
+            self.config_cache = _TimedConfigCache(self.config_cache, stats)
+
+    def reset(self) -> None:
+        # after a gap in the input: the buffered partial frame is dropped,
+        # and decoding resumes at the next sync word
+        if self.stats is not None:
+            self.stats.resync_bytes += len(self.buf) - self.pos
+        self.buf.clear()
+        self.pos = 0
+
+    def feed(self, data: ByteString) -> None:
+        if self.pos:
+            del self.buf[:self.pos]
+            self.pos = 0
+        self.buf += data
+
+    def frames(self) -> Iterator[AudioMuxElement]:
+        buf = self.buf
+        stats = self.stats
+        while True:
+            pos = buf.find(b'\x56', self.pos)
+            if pos < 0:
+                pos = len(buf)
+            if stats is not None:
+                stats.resync_bytes += pos - self.pos
+            self.pos = pos
+            if len(buf) - pos < 3:
+                return
+            if buf[pos + 1] & 0xe0 != 0xe0:
+                self.pos = pos + 1
+                if stats is not None:
+                    stats.resync_bytes += 1
+                continue
+            frame_end = pos + 3 + ((buf[pos + 1] & 0x1f) << 8 | buf[pos + 2])
+            if frame_end > len(buf):
+                return
+            # one copy: slicing the bytearray itself would make another
+            with memoryview(buf) as view:
+                data = bytes(view[pos + 3:frame_end])
+            self.pos = frame_end
+            if stats is not None:
+                audio_mux_element = _decode_element_stats(data, self.stream_mux_config, self.lazy,
+                                                          self.config_cache, stats)
+            elif self.lazy:
+                audio_mux_element = LazyAudioMuxElement.decode(data, self.stream_mux_config, True, self.config_cache)
+            else:
+                audio_mux_element = AudioMuxElement.decode(BitReader(data), self.stream_mux_config, True, self.config_cache)
+            if audio_mux_element.stream_mux_config:
+                self.stream_mux_config = audio_mux_element.stream_mux_config
+            yield audio_mux_element
+
+
+async def audio_sync_stream_async(reader: asyncio.StreamReader, chunk_size: int=LOAS_CHUNK_SIZE,
+                                  config_cache: StreamMuxConfigCache | None = None) -> AsyncIterator[AudioMuxElement]:
+    # audio_sync_stream() over an asyncio.StreamReader (anything with an
+    # awaitable read(n) will do)
+    # imported here: asyncio is slow to import and only needed on this path
+    import asyncio
+    decoder = LatmDecoder(config_cache)
+    while True:
+        data = await reader.read(chunk_size)
+        if not data:
+            return
+        decoder.feed(data)
+        for audio_mux_element in decoder.frames():
+            yield audio_mux_element
+        # read() doesn't suspend while the reader has data buffered; give
+        # other tasks a chance between chunks
+        await asyncio.sleep(0)
+
+
+MMAP_RELEASE_INTERVAL = 0x1000000
+
+def _drop_consumed_pages(mm: mmap.mmap, frames: Iterable[tuple[int, memoryview]]) -> Iterator[tuple[int, memoryview]]:
+    # keep RSS flat on long files: pages behind the current frame are given back
+    # to the page cache (they are simply faulted in again if still referenced)
+    released = 0
+    for offset, frame in frames:
+        if offset - released >= MMAP_RELEASE_INTERVAL:
+            n = offset // mmap.PAGESIZE * mmap.PAGESIZE
+            mm.madvise(mmap.MADV_DONTNEED, released, n - released)
+            released = n
+        yield offset, frame
+
+
+def audio_sync_stream_mmap(path: str | os.PathLike, config_cache: StreamMuxConfigCache | None = None,
+                           lazy: bool = False, stats: ParseStats | None = None) -> Iterator[AudioMuxElement]:
+    # payloads are memoryview slices of the mapping; they stay valid as long
+    # as they are referenced. the flac backend copies each frame into its
+    # reader, so the input is only zero-copy with the int and bitarray backends.
+    with open(path, 'rb') as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            return
+        mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        frames = loas_buffer_frames(mm)
+        if hasattr(mmap, 'MADV_DONTNEED'):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+            frames = _drop_consumed_pages(mm, frames)
+        yield from _audio_mux_elements(frames, False, config_cache, None, lazy, stats, lambda: len(mm))
+    finally:
+        try:
+            mm.close()
+        except BufferError:
+            # payload views are still alive; the mapping goes away with them
+            pass
@@ -1,18 +1,327 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+import argparse
+import os
 import sys
-from .latm import audio_sync_stream, StreamMuxConfig
+import time
 from .adts import ADTSHeader
+from .latm import StreamMuxConfig, _config_changed
+from .ts import audio_sync_stream_auto
+from .pipeline import PIPELINE_QUEUE_DEPTH, PrefetchReader, BackgroundWriter
+from .sink import FrameSink, AdtsSink, RawAuSink
+from .stats import ParseStats
 
-def latm2adts():
-    if len(sys.argv) < 3:
-        print("usage: latm2adts LATMFILE ADTSFILE", file=sys.stderr)
-        sys.exit(1)
+__all__ = [ 'ConversionResult', 'convert_latm_to_adts', 'latm2adts' ]
+
+@dataclass(eq=True, slots=True)
+class ConversionResult:
+    src: str = ''
+    dst: str = ''
+    frames: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    elapsed: float = 0.0
+    error: str | None = None
+    # files written, when every stream goes to its own output
+    outputs: list[str] = field(default_factory=list)
+    # streams left out with all streams, one message each
+    skipped: list[str] = field(default_factory=list)
+    stats: ParseStats | None = None
+
+    def __str__(self) -> str:
+        if self.error is not None:
+            return f'FAIL {self.src}: {self.error}'
+        elapsed = self.elapsed or 1e-9
+        dst = self.dst if not self.outputs else f'{len(self.outputs)} outputs ({self.dst})'
+        skipped = ''.join(f'\n     skipped {message}' for message in self.skipped)
+        return (f'ok   {self.src} -> {dst}: {self.frames} frames, {self.elapsed:.2f}s, '
+                f'{self.frames / elapsed:.0f} frames/s, {self.bytes_in / elapsed / 1e6:.1f} MB/s{skipped}')
+
+
+# fields: name (input file name without extension), program, layer, stream
+DEFAULT_STREAM_TEMPLATE = '{name}.p{program}l{layer}.aac'
+# pending output to stdout is written out at least this often (seconds)
+STDOUT_MAX_LATENCY = 0.5
+# reported for an input that converted without errors but had nothing in it
+NO_FRAMES_ERROR = 'no LATM frames found'
+
+def _open_sink(path: str, raw_au: bool, vectored: bool, writer: BackgroundWriter | None) -> FrameSink:
+    # outputs are opened unbuffered: the sink does the buffering, and
+    # finishes short writes itself (see write_all())
+    if path == '-':
+        sys.stdout.flush()
+        fp = open(sys.stdout.fileno(), 'wb', buffering=0, closefd=False)
+        max_latency = STDOUT_MAX_LATENCY
+    else:
+        fp = open(path, 'wb', buffering=0)
+        max_latency = None
+    sink_class = RawAuSink if raw_au else AdtsSink
+    return sink_class(fp, max_latency=max_latency, vectored=vectored, writer=writer)
+
+
+def convert_latm_to_adts(src: str, dst: str, pid: int | None = None, all_streams: bool = False,
+                         read_ahead: int = 0, write_behind: int = 0,
+                         raw_au: bool = False, vectored: bool = False,
+                         stats: ParseStats | None = None) -> ConversionResult:
+    # writes every sub frame of the first stream to dst ('-' for stdout);
+    # with all_streams, every (program, layer) goes to its own file named by
+    # formatting dst as a template (see DEFAULT_STREAM_TEMPLATE).
+    # read_ahead > 0 reads up to that many blocks ahead in a thread, and
+    # write_behind > 0 queues up to that many output blocks for a writer
+    # thread, so I/O overlaps parsing.
+    # raw_au writes length-prefixed AUs instead of ADTS, vectored writes
+    # with os.writev() instead of copying into a buffer (see FrameSink).
+    # with stats, parsing is instrumented and output time counts as 'write'
+    result = ConversionResult(src=src, dst=dst, stats=stats)
+    start = time.perf_counter()
+    name = os.path.splitext(os.path.basename(src))[0]
+    outputs: dict[tuple[int, int], tuple[str, FrameSink]] = {}
+    # output by stream id, for the config in effect
+    by_stream: list[FrameSink | None] = []
     stream_mux_config: StreamMuxConfig | None = None
-    with open(sys.argv[1], 'rb') as sp:
-        with open(sys.argv[2], 'wb') as dp:
-            for frame in audio_sync_stream(sp):
-                if frame.stream_mux_config:
+    writer = BackgroundWriter(write_behind) if write_behind > 0 else None
+    parsed = False
+    try:
+        sp = open(src, 'rb')
+        if read_ahead > 0:
+            sp = PrefetchReader(sp, depth=read_ahead)
+        with sp:
+            for frame in audio_sync_stream_auto(sp, pid, stats):
+                if _config_changed(frame.stream_mux_config, stream_mux_config):
                     stream_mux_config = frame.stream_mux_config
-                payload = frame.sub_frames[0][0].payload
-                adts_header: ADTSHeader = ADTSHeader.from_format(stream_mux_config.streams[0].audio_specific_config.format, len(payload))
-                dp.write(adts_header.tobytes())
-                dp.write(frame.sub_frames[0][0].payload)
+                    by_stream = []
+                    for stream in stream_mux_config.streams:
+                        if not all_streams and stream.id != 0:
+                            by_stream.append(None)
+                            continue
+                        key = (stream.program, stream.layer)
+                        format = stream.audio_specific_config.format
+                        if all_streams and not raw_au and not ADTSHeader.supports(format):
+                            # leave out what ADTS can't carry, not the whole input
+                            message = (f'program {stream.program} layer {stream.layer}: AOT {format.audio_object_type} '
+                                       f'with channel_configuration {format.channel_configuration}')
+                            if message not in result.skipped:
+                                result.skipped.append(message)
+                            by_stream.append(None)
+                            continue
+                        if key not in outputs:
+                            path = dst if not all_streams else dst.format(name=name, program=stream.program,
+                                                                          layer=stream.layer, stream=stream.id)
+                            outputs[key] = (path, _open_sink(path, raw_au, vectored, writer))
+                        output = outputs[key][1]
+                        output.set_format(format)
+                        by_stream.append(output)
+                if stats is not None:
+                    write_start = time.perf_counter()
+                for packets in frame.sub_frames:
+                    for packet in packets:
+                        output = by_stream[packet.stream_id]
+                        # streams absent from this chunk have no payload
+                        if output is not None and packet.payload:
+                            output.write(packet.payload)
+                if stats is not None:
+                    stats.times['write'] += time.perf_counter() - write_start
+                result.frames += 1
+            result.bytes_in = sp.tell()
+        parsed = True
+    finally:
+        close_start = time.perf_counter()
+        closed = False
+        try:
+            for _, output in outputs.values():
+                output.close()
+            closed = True
+        finally:
+            if writer is not None:
+                # a writer error is only raised when nothing else is
+                writer.join(raise_error=parsed and closed)
+            if stats is not None:
+                stats.times['write'] += time.perf_counter() - close_start
+    result.bytes_out = sum(output.bytes_out for _, output in outputs.values())
+    if all_streams:
+        result.outputs = [path for path, _ in outputs.values()]
+    elif not outputs and dst != '-':
+        # no config found; still leave an (empty) output behind
+        open(dst, 'wb').close()
+    result.elapsed = time.perf_counter() - start
+    if stats is not None:
+        stats.bytes_out = result.bytes_out
+        stats.finish()
+    return result
+
+
+def _convert_job(src: str, dst: str, pid: int | None, all_streams: bool = False,
+                 read_ahead: int = 0, write_behind: int = 0,
+                 raw_au: bool = False, vectored: bool = False, with_stats: bool = False) -> ConversionResult:
+    # runs in a worker process; never raise, so one bad file can't stop the batch
+    stats = ParseStats() if with_stats else None
+    try:
+        result = convert_latm_to_adts(src, dst, pid, all_streams, read_ahead, write_behind, raw_au, vectored, stats)
+        if result.frames == 0:
+            # most likely not LATM at all; don't count it as converted
+            result.error = NO_FRAMES_ERROR
+        return result
+    except Exception as e:
+        return ConversionResult(src=src, dst=dst, error=f'{type(e).__name__}: {e}',
+                                stats=stats.finish() if stats is not None else None)
+
+
+def _read_manifest(path: str, out_dir: str | None, template: str | None = None) -> list[tuple[str, str]]:
+    # each line is "SRC [DST]"; DST defaults to OUT_DIR/<basename>.aac, or
+    # to OUT_DIR/TEMPLATE when demuxing all streams
+    jobs = []
+    with open(path) as fp:
+        for line in fp:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            src, _, dst = line.partition('\t') if '\t' in line else line.partition(' ')
+            jobs.append((src, dst.strip() or _output_path(src, out_dir, template)))
+    return jobs
+
+
+def _output_path(src: str, out_dir: str | None, template: str | None = None) -> str:
+    if template is not None:
+        return os.path.join(out_dir if out_dir else os.path.dirname(src), template)
+    name = os.path.splitext(os.path.basename(src))[0] + '.aac'
+    return os.path.join(out_dir, name) if out_dir else os.path.splitext(src)[0] + '.aac'
+
+
+def _output_key(dst: str, src: str, all_streams: bool) -> str:
+    # what dst is written as, for comparing jobs; with all_streams, dst is a
+    # template and only {name} is known before parsing
+    if all_streams:
+        name = os.path.splitext(os.path.basename(src))[0]
+        try:
+            dst = dst.format(name=name, program='{program}', layer='{layer}', stream='{stream}')
+        except (KeyError, IndexError, ValueError):
+            # a broken template fails the job itself
+            pass
+    return os.path.normcase(os.path.abspath(dst))
+
+
+def _find_collisions(jobs: list[tuple[str, str]], all_streams: bool = False) -> list[str]:
+    # errors for jobs that would write the same output, which would leave
+    # whichever finishes last (or a mix of both with -j)
+    seen: dict[str, str] = {}
+    errors = []
+    for src, dst in jobs:
+        key = _output_key(dst, src, all_streams)
+        if key in seen:
+            errors.append(f'{seen[key]} and {src} both write to {dst}')
+        else:
+            seen[key] = src
+    return errors
+
+
+def _run_batch(jobs: list[tuple[str, str]], num_workers: int, pid: int | None, all_streams: bool = False,
+               read_ahead: int = 0, write_behind: int = 0, raw_au: bool = False, vectored: bool = False,
+               with_stats: bool = False) -> int:
+    start = time.perf_counter()
+    results: list[ConversionResult] = []
+    options = (pid, all_streams, read_ahead, write_behind, raw_au, vectored, with_stats)
+    if num_workers <= 1:
+        for src, dst in jobs:
+            results.append(_convert_job(src, dst, *options))
+            _print_result(results[-1])
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = { executor.submit(_convert_job, src, dst, *options): (src, dst) for src, dst in jobs }
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # the worker itself died
+                    src, dst = futures[future]
+                    result = ConversionResult(src=src, dst=dst, error=f'{type(e).__name__}: {e}')
+                results.append(result)
+                _print_result(result)
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for result in results if result.error is not None)
+    frames = sum(result.frames for result in results)
+    bytes_in = sum(result.bytes_in for result in results)
+    print(f'{len(results) - failed} converted, {failed} failed, {frames} frames in {elapsed:.2f}s '
+          f'({frames / elapsed:.0f} frames/s, {bytes_in / elapsed / 1e6:.1f} MB/s)', file=sys.stderr)
+    if with_stats:
+        # stage times summed over jobs, elapsed is per job too
+        total = ParseStats()
+        for result in results:
+            if result.stats is not None:
+                total.add(result.stats)
+        print(f'total:\n{total}', file=sys.stderr)
+    return 1 if failed else 0
+
+
+def _print_result(result: ConversionResult) -> None:
+    print(result, file=sys.stderr)
+    if result.stats is not None:
+        print(result.stats, file=sys.stderr)
+
+
+def latm2adts():
+    parser = argparse.ArgumentParser(prog='latm2adts', description='remux LATM/LOAS (or MPEG-2 TS carrying LATM) into ADTS',
+                                     usage='%(prog)s LATMFILE ADTSFILE\n'
+                                           '       %(prog)s -a [-t TEMPLATE] LATMFILE [TEMPLATE]\n'
+                                           '       %(prog)s [-a] [-j N] -o DIR LATMFILE...\n'
+                                           '       %(prog)s [-a] [-j N] [-o DIR] -m MANIFEST')
+    parser.add_argument('files', nargs='*', metavar='FILE')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='number of worker processes (default: CPU count)')
+    parser.add_argument('-o', '--out-dir', help='batch mode: write OUT_DIR/<name>.aac for each input')
+    parser.add_argument('-m', '--manifest', help='batch mode: file with one "SRC [DST]" per line')
+    parser.add_argument('-a', '--all-streams', action='store_true',
+                        help='write every (program, layer) to its own file instead of only the first stream')
+    parser.add_argument('-t', '--template', default=DEFAULT_STREAM_TEMPLATE,
+                        help='with -a: output file name, formatted with {name}, {program}, {layer} and {stream} '
+                             f'(default: {DEFAULT_STREAM_TEMPLATE.replace("%", "%%")})')
+    parser.add_argument('-P', '--pipeline', action='store_true',
+                        help='read ahead and write behind in threads, overlapping I/O with parsing')
+    parser.add_argument('--read-queue', type=int, default=PIPELINE_QUEUE_DEPTH,
+                        help=f'with -P: 1 MiB blocks to read ahead (default: {PIPELINE_QUEUE_DEPTH})')
+    parser.add_argument('--write-queue', type=int, default=PIPELINE_QUEUE_DEPTH,
+                        help=f'with -P: output blocks queued for writing; 0 writes in the main thread (default: {PIPELINE_QUEUE_DEPTH})')
+    parser.add_argument('--raw', action='store_true',
+                        help='write each AU preceded by its length (4 bytes, big endian) instead of ADTS')
+    parser.add_argument('--writev', action='store_true',
+                        help='write output with os.writev() instead of copying it into a buffer (ignored with -P)')
+    parser.add_argument('--stats', action='store_true',
+                        help='print frame, byte and error counters and time per stage (sync, config, payload, write) to stderr')
+    parser.add_argument('--pid', type=lambda x: int(x, 0),
+                        help='TS input: PID of the LATM stream (default: first stream_type 0x11 in PMT)')
+    args = parser.parse_args()
+    template = args.template if args.all_streams else None
+    read_ahead = args.read_queue if args.pipeline else 0
+    write_behind = args.write_queue if args.pipeline else 0
+
+    if not args.out_dir and not args.manifest:
+        if args.all_streams and len(args.files) == 1:
+            args.files.append(_output_path(args.files[0], None, template))
+        if len(args.files) != 2:
+            parser.print_usage(sys.stderr)
+            sys.exit(1)
+        stats = ParseStats() if args.stats else None
+        result = convert_latm_to_adts(args.files[0], args.files[1], args.pid, args.all_streams, read_ahead,
+                                      write_behind, args.raw, args.writev, stats)
+        if stats is not None:
+            print(stats, file=sys.stderr)
+        for message in result.skipped:
+            print(f'latm2adts: {args.files[0]}: skipped {message}', file=sys.stderr)
+        if result.frames == 0:
+            print(f'latm2adts: {args.files[0]}: {NO_FRAMES_ERROR}', file=sys.stderr)
+            sys.exit(1)
+        return
+
+    jobs = [(src, _output_path(src, args.out_dir, template)) for src in args.files]
+    if args.manifest:
+        jobs += _read_manifest(args.manifest, args.out_dir, template)
+    collisions = _find_collisions(jobs, args.all_streams)
+    if collisions:
+        for error in collisions:
+            print(f'latm2adts: {error}', file=sys.stderr)
+        print('latm2adts: name the outputs in a manifest (-m) instead', file=sys.stderr)
+        sys.exit(1)
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+    sys.exit(_run_batch(jobs, args.jobs or os.cpu_count() or 1, args.pid, args.all_streams, read_ahead, write_behind,
+                        args.raw, args.writev, args.stats))
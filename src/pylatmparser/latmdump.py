@@ -1,11 +1,184 @@
+from __future__ import annotations
+from dataclasses import fields, is_dataclass, replace
+from typing import IO, Any, Callable
+import argparse
+import hashlib
+import json
 import sys
-from .latm import audio_sync_stream, StreamMuxConfig
-from .adts import ADTSHeader
+import time
+from .latm import AudioMuxElement, LatmPacket
+from .ts import audio_sync_stream_auto
+from .probe import probe
+from .stats import ParseStats
+
+__all__ = [ 'latmdump', 'dump_frames' ]
+
+DUMP_FORMATS = ('text', 'jsonl', 'compact')
+PAYLOAD_MODES = ('full', 'length', 'hash', 'omit')
+# output is written through a buffer of this size rather than line by line
+DUMP_BUFFER_SIZE = 1 << 20
+
+
+def _payload_hash(payload: bytes | memoryview) -> str:
+    return hashlib.sha1(payload).hexdigest()
+
+
+def _payload_converter(mode: str) -> Callable[[bytes | memoryview], Any]:
+    if mode == 'full':
+        return lambda payload: payload.hex()
+    if mode == 'length':
+        return len
+    if mode == 'hash':
+        return _payload_hash
+    return lambda payload: None
+
+
+_field_names: dict[type, tuple[str, ...]] = {}
+
+def _to_json(obj: Any, payload: Callable[[bytes | memoryview], Any]) -> Any:
+    # like dataclasses.asdict(), without the deep copies; LatmPacket.payload
+    # goes through payload, other bytes become hex
+    if isinstance(obj, (int, float, str)) or obj is None:
+        return obj
+    if isinstance(obj, LatmPacket):
+        return { 'stream_id': obj.stream_id, 'mux_slot_length_bytes': obj.mux_slot_length_bytes,
+                 'au_end_flag': obj.au_end_flag, 'payload': payload(obj.payload) }
+    if is_dataclass(obj):
+        names = _field_names.get(type(obj))
+        if names is None:
+            names = _field_names[type(obj)] = tuple(f.name for f in fields(obj))
+        return { name: _to_json(getattr(obj, name), payload) for name in names }
+    if isinstance(obj, (list, tuple)):
+        return [_to_json(x, payload) for x in obj]
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return bytes(obj).hex()
+    return repr(obj)
+
+
+def _text_formatter(payload_mode: str) -> Callable[[int, AudioMuxElement], str]:
+    if payload_mode == 'full':
+        return lambda index, frame: repr(frame)
+    payload = _payload_converter(payload_mode)
+
+    def format_frame(index: int, frame: AudioMuxElement) -> str:
+        sub_frames = [[replace(packet, payload=payload(packet.payload)) for packet in packets]
+                      for packets in frame.sub_frames]
+        return repr(replace(frame, sub_frames=sub_frames))
+    return format_frame
+
+
+def _jsonl_formatter(payload_mode: str) -> Callable[[int, AudioMuxElement], str]:
+    payload = _payload_converter(payload_mode)
+    encode = json.JSONEncoder(separators=(',', ':')).encode
+    # configs come from StreamMuxConfigCache, so a repeated one is the same
+    # object and its encoding can be reused
+    last_config: list[Any] = [None, 'null']
+
+    def format_frame(index: int, frame: AudioMuxElement) -> str:
+        config = frame.stream_mux_config
+        if config is None:
+            config_json = 'null'
+        else:
+            if config is not last_config[0]:
+                last_config[:] = config, encode(_to_json(config, payload))
+            config_json = last_config[1]
+        sub_frames = [[_to_json(packet, payload) for packet in packets] for packets in frame.sub_frames]
+        return (f'{{"frame":{index},"use_same_stream_mux":{encode(frame.use_same_stream_mux)},'
+                f'"stream_mux_config":{config_json},"sub_frames":{encode(sub_frames)},'
+                f'"other_data_bit":{encode(frame.other_data_bit)}}}')
+    return format_frame
+
+
+def _compact_formatter(payload_mode: str) -> Callable[[int, AudioMuxElement], str]:
+    # "<frame> <C if a StreamMuxConfig is present, - otherwise> <payloads>", with
+    # payloads of a sub frame separated by ',' and sub frames by ';'. an
+    # omitted payload is shown as '_'
+    if payload_mode == 'hash':
+        def packet_text(packet: LatmPacket) -> str:
+            return f'{len(packet.payload)}:{_payload_hash(packet.payload)}'
+    elif payload_mode == 'full':
+        def packet_text(packet: LatmPacket) -> str:
+            return f'{len(packet.payload)}:{packet.payload.hex()}'
+    elif payload_mode == 'length':
+        def packet_text(packet: LatmPacket) -> str:
+            return str(len(packet.payload))
+    else:
+        def packet_text(packet: LatmPacket) -> str:
+            return '_'
+
+    def format_frame(index: int, frame: AudioMuxElement) -> str:
+        payloads = ';'.join(','.join(map(packet_text, packets)) for packets in frame.sub_frames)
+        return f'{index} {"C" if frame.stream_mux_config else "-"} {payloads}'
+    return format_frame
+
+
+_FORMATTERS = { 'text': _text_formatter, 'jsonl': _jsonl_formatter, 'compact': _compact_formatter }
+
+def dump_frames(frames: Any, out: IO[str], format: str='text', payload_mode: str='full',
+                stats: ParseStats | None = None) -> int:
+    # writes one line per AudioMuxElement, returns the number of frames.
+    # with stats, formatting and writing count as 'write' (pass the same
+    # stats to the parser for the other stages)
+    if format not in DUMP_FORMATS:
+        raise ValueError(f'unknown dump format: {format}')
+    if payload_mode not in PAYLOAD_MODES:
+        raise ValueError(f'unknown payload mode: {payload_mode}')
+    format_frame = _FORMATTERS[format](payload_mode)
+    write = out.write
+    count = 0
+    if stats is not None:
+        clock = time.perf_counter
+        times = stats.times
+        for count, frame in enumerate(frames, 1):
+            start = clock()
+            line = format_frame(count - 1, frame)
+            write(line)
+            write('\n')
+            times['write'] += clock() - start
+            stats.bytes_out += len(line) + 1
+        return count
+    for count, frame in enumerate(frames, 1):
+        write(format_frame(count - 1, frame))
+        write('\n')
+    return count
+
 
 def latmdump():
-    if len(sys.argv) < 2:
-        print("usage: latm2dump LATMFILE", file=sys.stderr)
-        sys.exit(1)
-    with open(sys.argv[1], 'rb') as fp:
-        for frame in audio_sync_stream(fp):
-            print(frame)
+    parser = argparse.ArgumentParser(prog='latmdump', description='dump AudioMuxElements of LATM/LOAS (or MPEG-2 TS carrying LATM)')
+    parser.add_argument('file', metavar='LATMFILE')
+    parser.add_argument('-s', '--summary', action='store_true',
+                        help='print stream statistics instead of every frame (payloads are not decoded)')
+    parser.add_argument('-f', '--format', choices=DUMP_FORMATS, default='text',
+                        help='text: dataclass repr (default), jsonl: one JSON object per frame, '
+                             'compact: one short line per frame')
+    parser.add_argument('-p', '--payload', choices=PAYLOAD_MODES, default=None,
+                        help='how payloads are shown: full (hex), length, hash (SHA-1) or omit '
+                             '(default: full for text, length otherwise)')
+    parser.add_argument('-o', '--output', help='write to OUTPUT instead of stdout')
+    parser.add_argument('--stats', action='store_true',
+                        help='print frame, byte and error counters and time per stage to stderr')
+    parser.add_argument('--pid', type=lambda x: int(x, 0),
+                        help='TS input: PID of the LATM stream (default: first stream_type 0x11 in PMT)')
+    args = parser.parse_args()
+    payload_mode = args.payload or ('full' if args.format == 'text' else 'length')
+    stats = ParseStats() if args.stats else None
+    with open(args.file, 'rb') as fp:
+        if args.summary:
+            print(probe(fp, args.pid))
+            return
+        if args.output:
+            out = open(args.output, 'w', buffering=DUMP_BUFFER_SIZE)
+        else:
+            out = open(sys.stdout.fileno(), 'w', buffering=DUMP_BUFFER_SIZE, closefd=False)
+        try:
+            dump_frames(audio_sync_stream_auto(fp, args.pid, stats), out, args.format, payload_mode, stats)
+        except BrokenPipeError:
+            # e.g. piped into head
+            pass
+        finally:
+            try:
+                out.close()
+            except BrokenPipeError:
+                pass
+        if stats is not None:
+            print(stats.finish(), file=sys.stderr)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterator
+import mmap
+import os
+from .bitstream import BitReader
+from .latm import StreamMuxConfig, StreamMuxConfigCache, AudioMuxElement, loas_buffer_frames, find_loas_sync
+
+__all__ = [ 'split_loas_file', 'parallel_audio_sync_stream' ]
+
+PARALLEL_RANGE_SIZE = 0x2000000
+
+
+@dataclass(slots=True)
+class _RangeResult:
+    # frames seen before the first StreamMuxConfig of the range; they are
+    # decoded by the caller with the config carried over from the previous range
+    pending: list[bytes] = field(default_factory=list)
+    elements: list[AudioMuxElement] = field(default_factory=list)
+    # offset where the next range has to resume, None at the end of file
+    next_offset: int | None = None
+    error: Exception | None = None
+
+
+def _map_file(path: str | os.PathLike) -> mmap.mmap | None:
+    with open(path, 'rb') as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def split_loas_file(path: str | os.PathLike, parts: int, depth: int=3) -> list[int]:
+    # start offsets of up to parts byte ranges, each (except the first) snapped
+    # to a verified sync word
+    mm = _map_file(path)
+    if mm is None:
+        return [0]
+    try:
+        starts = [0]
+        for i in range(1, parts):
+            pos = find_loas_sync(mm, len(mm) * i // parts, depth)
+            if pos < 0:
+                break
+            if pos > starts[-1]:
+                starts.append(pos)
+        return starts
+    finally:
+        mm.close()
+
+
+def _parse_range(path: str | os.PathLike, start: int, stop: int,
+                 stream_mux_config: StreamMuxConfig | None = None) -> _RangeResult:
+    result = _RangeResult()
+    mm = _map_file(path)
+    if mm is None:
+        return result
+    try:
+        config_cache = StreamMuxConfigCache()
+        frames = loas_buffer_frames(mm, start)
+        for offset, frame in frames:
+            if offset >= stop:
+                result.next_offset = offset
+                break
+            data = bytes(frame)
+            if stream_mux_config is None and data and data[0] & 0x80:
+                # useSameStreamMux with no config known yet
+                result.pending.append(data)
+                continue
+            try:
+                element = AudioMuxElement.decode(BitReader(data), stream_mux_config, True, config_cache)
+            except Exception as e:
+                result.error = e
+                break
+            if element.stream_mux_config:
+                stream_mux_config = element.stream_mux_config
+            result.elements.append(element)
+        frame = None
+        frames.close()
+    finally:
+        try:
+            mm.close()
+        except BufferError:
+            pass
+    return result
+
+
+def parallel_audio_sync_stream(path: str | os.PathLike, jobs: int | None = None, depth: int=3,
+                               range_size: int=PARALLEL_RANGE_SIZE) -> Iterator[AudioMuxElement]:
+    # same elements as audio_sync_stream(open(path, 'rb')), parsed by a pool
+    # of worker processes
+    jobs = jobs or os.cpu_count() or 1
+    size = os.path.getsize(path)
+    starts = split_loas_file(path, max(jobs, size // range_size), depth)
+    stops = starts[1:] + [size]
+
+    config_cache = StreamMuxConfigCache()
+    stream_mux_config: StreamMuxConfig | None = None
+    expected: int | None = 0
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures: deque[Future] = deque()
+        submitted = 0
+        for i in range(len(starts)):
+            # keep a bounded number of ranges in flight
+            while submitted < len(starts) and submitted < i + 2 * jobs:
+                futures.append(executor.submit(_parse_range, path, starts[submitted], stops[submitted]))
+                submitted += 1
+            future = futures.popleft()
+            if expected is None:
+                future.cancel()
+                continue
+            if expected == starts[i]:
+                result = future.result()
+            else:
+                # the previous range ran past our snapped sync point; parse
+                # this range here, picking up where the previous one stopped
+                future.cancel()
+                result = _parse_range(path, expected, stops[i], stream_mux_config)
+            for data in result.pending:
+                element = AudioMuxElement.decode(BitReader(data), stream_mux_config, True, config_cache)
+                if element.stream_mux_config:
+                    stream_mux_config = element.stream_mux_config
+                yield element
+            for element in result.elements:
+                if element.stream_mux_config:
+                    stream_mux_config = element.stream_mux_config
+                yield element
+            if result.error is not None:
+                raise result.error
+            expected = result.next_offset
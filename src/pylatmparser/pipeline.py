@@ -0,0 +1,174 @@
+from __future__ import annotations
+from collections.abc import ByteString
+from typing import IO
+import queue
+import threading
+
+__all__ = [ 'PrefetchReader', 'BackgroundWriter', 'write_all' ]
+
+PIPELINE_BLOCK_SIZE = 0x100000
+PIPELINE_QUEUE_DEPTH = 8
+
+
+def write_all(fp: IO[bytes], data: ByteString) -> None:
+    # write() on an unbuffered file may write only part of data (pipes,
+    # signals); keep writing until all of it is out
+    view = memoryview(data)
+    while view:
+        n = fp.write(view)
+        if n is None:
+            # non-blocking file that can't take anything now
+            raise BlockingIOError(f'write would block with {len(view)} bytes left')
+        view = view[n:]
+
+
+class PrefetchReader:
+    # read-only file wrapper whose reads are served from blocks a thread
+    # reads ahead, up to depth blocks, so parsing overlaps with I/O. seek()
+    # restarts the read-ahead.
+    def __init__(self, fp: IO[bytes], block_size: int=PIPELINE_BLOCK_SIZE, depth: int=PIPELINE_QUEUE_DEPTH):
+        self.fp = fp
+        self.name = getattr(fp, 'name', None)
+        self.block_size = block_size
+        self.depth = depth
+        self.pos = fp.tell()
+        self.block = memoryview(b'')
+        self.eof = False
+        self.queue: queue.Queue | None = None
+        self.stop: threading.Event | None = None
+        self.thread: threading.Thread | None = None
+
+    def _run(self, q: queue.Queue, stop: threading.Event) -> None:
+        try:
+            while not stop.is_set():
+                data = self.fp.read(self.block_size)
+                q.put(data)
+                if not data:
+                    return
+        except BaseException as e:
+            q.put(e)
+
+    def _stop(self) -> None:
+        if self.thread is None:
+            return
+        self.stop.set()
+        # unblock a pending put()
+        while self.thread.is_alive():
+            try:
+                self.queue.get(timeout=0.01)
+            except queue.Empty:
+                pass
+        self.thread.join()
+        self.thread = None
+
+    def _next_block(self) -> bool:
+        if self.eof:
+            return False
+        if self.thread is None:
+            self.queue = queue.Queue(self.depth)
+            self.stop = threading.Event()
+            self.thread = threading.Thread(target=self._run, args=(self.queue, self.stop), daemon=True)
+            self.thread.start()
+        data = self.queue.get()
+        if isinstance(data, BaseException):
+            self.eof = True
+            raise data
+        if not data:
+            self.eof = True
+            return False
+        self.block = memoryview(data)
+        return True
+
+    def readinto(self, b: bytearray | memoryview) -> int:
+        out = memoryview(b).cast('B')
+        n = 0
+        while n < len(out):
+            if not self.block and not self._next_block():
+                break
+            k = min(len(out) - n, len(self.block))
+            out[n:n + k] = self.block[:k]
+            self.block = self.block[k:]
+            n += k
+        self.pos += n
+        return n
+
+    def read(self, size: int=-1) -> bytes:
+        if size < 0:
+            chunks = [bytes(self.block)]
+            self.block = memoryview(b'')
+            while self._next_block():
+                chunks.append(bytes(self.block))
+            self.block = memoryview(b'')
+            data = b''.join(chunks)
+            self.pos += len(data)
+            return data
+        buf = bytearray(size)
+        n = self.readinto(buf)
+        del buf[n:]
+        return bytes(buf)
+
+    def seek(self, offset: int, whence: int=0) -> int:
+        self._stop()
+        if whence == 1:
+            offset, whence = self.pos + offset, 0
+        self.pos = self.fp.seek(offset, whence)
+        self.block = memoryview(b'')
+        self.eof = False
+        return self.pos
+
+    def tell(self) -> int:
+        return self.pos
+
+    def close(self) -> None:
+        self._stop()
+        self.fp.close()
+
+    def __enter__(self) -> PrefetchReader:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class BackgroundWriter:
+    # one thread doing the writes (and closes) of any number of files, in
+    # submission order. at most depth blocks wait in the queue. the first
+    # error is raised from the next write() or from join().
+    def __init__(self, depth: int=PIPELINE_QUEUE_DEPTH):
+        self.queue: queue.Queue = queue.Queue(depth)
+        self.error: BaseException | None = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            fp, data = item
+            try:
+                if data is None:
+                    fp.close()
+                elif self.error is None:
+                    write_all(fp, data)
+            except BaseException as e:
+                if self.error is None:
+                    self.error = e
+
+    def write(self, fp: IO[bytes], data: ByteString) -> None:
+        # data must not be modified afterwards
+        if self.error is not None:
+            raise self.error
+        self.queue.put((fp, data))
+
+    def close(self, fp: IO[bytes]) -> None:
+        self.queue.put((fp, None))
+
+    def join(self, raise_error: bool = True) -> None:
+        # raise_error=False when another exception is on its way, which the
+        # writer's error must not replace
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        if raise_error and self.error is not None:
+            raise self.error
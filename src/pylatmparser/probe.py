@@ -0,0 +1,252 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import IO, Iterator
+import os
+from .latm import (StreamMuxConfig, StreamMuxConfigCache, LazyAudioMuxElement, loas_frames, loas_buffer_frames,
+                   find_loas_sync, _config_changed, _scan_lazy_elements)
+from .ts import TS_PACKET_SIZES, detect_ts_packet_size, ts_latm_stream
+
+__all__ = [ 'RunningStats', 'ConfigSegment', 'ProbeResult', 'QuickProbeResult', 'probe', 'quick_probe' ]
+
+# bytes read at the head of the file and at each sample point of quick_probe()
+QUICK_PROBE_HEAD_SIZE = 0x40000
+QUICK_PROBE_WINDOW = 0x8000
+QUICK_PROBE_FRAMES = 16
+
+@dataclass(eq=True, slots=True)
+class RunningStats:
+    count: int = 0
+    total: float = 0
+    min: float | None = None
+    max: float | None = None
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float | None:
+        return self.total / self.count if self.count else None
+
+    def __str__(self) -> str:
+        if not self.count:
+            return 'n/a'
+        return f'min {self.min:.0f}, avg {self.mean:.0f}, max {self.max:.0f}'
+
+
+@dataclass(eq=True, slots=True)
+class ConfigSegment:
+    # run of frames sharing one StreamMuxConfig
+    offset: int | None = None
+    first_frame: int = 0
+    frames: int = 0
+    duration: float = 0.0
+    stream_mux_config: StreamMuxConfig | None = None
+
+    def __str__(self) -> str:
+        fmt = self.stream_mux_config.streams[0].audio_specific_config.format
+        offset = '' if self.offset is None else f' @{self.offset}'
+        return (f'frame {self.first_frame}{offset}: {self.frames} frames, {self.duration:.3f}s, '
+                f'aot {fmt.audio_object_type}, {fmt.sample_rate} Hz, channel config {fmt.channel_configuration}, '
+                f'{len(self.stream_mux_config.streams)} stream(s), {self.stream_mux_config.num_sub_frames} sub frame(s)')
+
+
+@dataclass(eq=True, slots=True)
+class ProbeResult:
+    frames: int = 0
+    bytes: int = 0
+    duration: float = 0.0
+    segments: list[ConfigSegment] = field(default_factory=list)
+    # bits per second of each frame's payloads
+    bitrate: RunningStats = field(default_factory=RunningStats)
+    # latm_buffer_fullness of stream 0, over the frames that carry a StreamMuxConfig
+    buffer_fullness: RunningStats = field(default_factory=RunningStats)
+    # bytes skipped to find the next sync word (LOAS input only)
+    resync_gaps: RunningStats = field(default_factory=RunningStats)
+    # frames before the first StreamMuxConfig, which can't be decoded
+    undecodable_frames: int = 0
+
+    def _add(self, offset: int | None, size: int, element: LazyAudioMuxElement,
+             stream_mux_config: StreamMuxConfig | None) -> StreamMuxConfig | None:
+        config = element.stream_mux_config
+        if config is not None:
+            if _config_changed(config, stream_mux_config):
+                self.segments.append(ConfigSegment(offset=offset, first_frame=self.frames, stream_mux_config=config))
+            stream_mux_config = config
+            self.buffer_fullness.add(config.streams[0].latm_buffer_fullness or 0)
+        if stream_mux_config is None:
+            self.undecodable_frames += 1
+            return None
+        frame_duration = stream_mux_config.frame_duration
+        segment = self.segments[-1]
+        segment.frames += 1
+        segment.duration += frame_duration
+        self.frames += 1
+        self.bytes += size
+        self.duration += frame_duration
+        if frame_duration:
+            self.bitrate.add(sum(map(sum, element.payload_lengths)) * 8 / frame_duration)
+        return stream_mux_config
+
+    def __str__(self) -> str:
+        bitrate = self.bytes * 8 / self.duration if self.duration else 0
+        lines = [f'frames: {self.frames} ({self.undecodable_frames} before first config)',
+                 f'duration: {self.duration:.3f}s',
+                 f'bytes: {self.bytes} ({bitrate / 1000:.1f} kbit/s including LOAS overhead)',
+                 f'payload bitrate (bit/s): {self.bitrate}',
+                 f'latm_buffer_fullness: {self.buffer_fullness}',
+                 f'resync gaps: {self.resync_gaps.count}, {self.resync_gaps.total:.0f} bytes, largest {self.resync_gaps.max or 0:.0f}',
+                 f'config segments: {len(self.segments)}']
+        lines += [f'  {segment}' for segment in self.segments]
+        return '\n'.join(lines)
+
+
+def _lazy_elements(fp: IO[bytes], result: ProbeResult,
+                   config_cache: StreamMuxConfigCache) -> Iterator[tuple[int, int, LazyAudioMuxElement]]:
+    expected = 0
+    for offset, size, element, _, _ in _scan_lazy_elements(loas_frames(fp), None, config_cache):
+        if offset != expected:
+            result.resync_gaps.add(offset - expected)
+        expected = offset + size
+        yield offset, size, element
+    fp.seek(0, 2)
+    end = fp.tell()
+    if end != expected:
+        result.resync_gaps.add(end - expected)
+
+
+def probe(fp: IO[bytes], pid: int | None = None) -> ProbeResult:
+    # one pass over LOAS (or MPEG-2 TS carrying LATM) that keeps running
+    # totals only, so memory doesn't grow with the length of the stream
+    result = ProbeResult()
+    config_cache = StreamMuxConfigCache()
+    stream_mux_config: StreamMuxConfig | None = None
+    head = fp.read(max(TS_PACKET_SIZES) * 4)
+    fp.seek(0)
+    if detect_ts_packet_size(head):
+        for element in ts_latm_stream(fp, pid, config_cache, lazy=True):
+            stream_mux_config = result._add(None, len(element.data) + 3, element, stream_mux_config)
+        return result
+    for offset, size, element in _lazy_elements(fp, result, config_cache):
+        stream_mux_config = result._add(offset, size, element, stream_mux_config)
+    return result
+
+
+@dataclass(eq=True, slots=True)
+class QuickProbeResult:
+    audio_object_type: int = 0
+    sample_rate: int = 0
+    channel_configuration: int | None = None
+    num_streams: int = 0
+    stream_mux_config: StreamMuxConfig | None = None
+    # estimates, extrapolated from file size unless exact
+    duration: float = 0.0
+    bitrate: float = 0.0
+    # 0.0 (no idea) .. 1.0 (measured over the whole file)
+    confidence: float = 0.0
+    exact: bool = False
+    samples: int = 0
+    synced_samples: int = 0
+    frames: int = 0
+
+    def __str__(self) -> str:
+        how = 'exact' if self.exact else f'estimated, confidence {self.confidence:.2f}'
+        return (f'aot {self.audio_object_type}, {self.sample_rate} Hz, channel config {self.channel_configuration}, '
+                f'{self.num_streams} stream(s), {self.duration:.3f}s, {self.bitrate / 1000:.1f} kbit/s ({how})')
+
+
+def _sample_frames(buf: bytes, stream_mux_config: StreamMuxConfig | None, config_cache: StreamMuxConfigCache,
+                   max_frames: int, depth: int) -> tuple[int, float, StreamMuxConfig | None, int]:
+    # (bytes, seconds, last config, frame count) of up to max_frames frames
+    # following the first verified sync word in buf. bytes is the span from
+    # the first frame to the end of the last one, so that garbage between
+    # frames counts as it does in the size of the file
+    pos = find_loas_sync(buf, 0, depth)
+    if pos < 0:
+        return 0, 0.0, stream_mux_config, 0
+    first = end = 0
+    seconds = 0.0
+    count = 0
+    for offset, size, _, config, _ in _scan_lazy_elements(loas_buffer_frames(buf, pos), stream_mux_config,
+                                                          config_cache):
+        stream_mux_config = config
+        if stream_mux_config is None:
+            continue
+        if not count:
+            first = offset
+        end = offset + size
+        seconds += stream_mux_config.frame_duration
+        count += 1
+        if count == max_frames:
+            break
+    return end - first, seconds, stream_mux_config, count
+
+
+def quick_probe(path: str | os.PathLike, samples: int=8, depth: int=3) -> QuickProbeResult:
+    # format from the first StreamMuxConfig, duration and bitrate extrapolated
+    # from a few frames at `samples` evenly spaced offsets. reads about
+    # QUICK_PROBE_HEAD_SIZE + samples * QUICK_PROBE_WINDOW bytes, whatever the
+    # size of the file; small files are probed exactly instead.
+    result = QuickProbeResult(samples=samples)
+    with open(path, 'rb') as fp:
+        size = os.fstat(fp.fileno()).st_size
+        if size <= QUICK_PROBE_HEAD_SIZE + samples * QUICK_PROBE_WINDOW:
+            full = probe(fp)
+            if full.segments:
+                result.stream_mux_config = full.segments[0].stream_mux_config
+            result.duration = full.duration
+            result.bitrate = full.bytes * 8 / full.duration if full.duration else 0.0
+            result.frames = full.frames
+            result.confidence = 1.0 if full.frames else 0.0
+            result.exact = True
+            _set_format(result)
+            return result
+
+        config_cache = StreamMuxConfigCache()
+        nbytes, seconds, stream_mux_config, count = _sample_frames(fp.read(QUICK_PROBE_HEAD_SIZE), None, config_cache,
+                                                                   QUICK_PROBE_FRAMES, depth)
+        if stream_mux_config is None:
+            return result
+        result.stream_mux_config = stream_mux_config
+        _set_format(result)
+        rates = [nbytes / seconds] if seconds else []
+        result.frames = count
+        configs_differ = False
+        for i in range(1, samples + 1):
+            fp.seek(size * i // (samples + 1))
+            nbytes, seconds, config, count = _sample_frames(fp.read(QUICK_PROBE_WINDOW), stream_mux_config, config_cache,
+                                                            QUICK_PROBE_FRAMES, depth)
+            if not count or not seconds:
+                continue
+            if _config_changed(config, stream_mux_config):
+                configs_differ = True
+            result.synced_samples += 1
+            result.frames += count
+            rates.append(nbytes / seconds)
+    if not rates:
+        return result
+    mean = sum(rates) / len(rates)
+    result.bitrate = mean * 8
+    result.duration = size / mean
+    # lower confidence for samples that didn't sync, for bitrate spread
+    # between samples and for a config that changes midway
+    spread = (sum((rate - mean) ** 2 for rate in rates) / len(rates)) ** 0.5 / mean
+    confidence = (result.synced_samples / samples if samples else 0.5) * max(0.0, 1.0 - spread)
+    if configs_differ:
+        confidence *= 0.5
+    result.confidence = confidence
+    return result
+
+
+def _set_format(result: QuickProbeResult) -> None:
+    if result.stream_mux_config is None:
+        return
+    fmt = result.stream_mux_config.streams[0].audio_specific_config.format
+    result.audio_object_type = fmt.audio_object_type
+    result.sample_rate = fmt.sample_rate
+    result.channel_configuration = fmt.channel_configuration
+    result.num_streams = len(result.stream_mux_config.streams)
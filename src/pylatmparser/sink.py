@@ -0,0 +1,129 @@
+from __future__ import annotations
+from collections.abc import ByteString
+from typing import IO
+import os
+import time
+from .asc import Format
+from .adts import ADTSHeader, ADTSHeaderTemplate
+from .pipeline import BackgroundWriter, write_all
+
+__all__ = [ 'FrameSink', 'AdtsSink', 'RawAuSink' ]
+
+# frames are collected until this many bytes are pending
+SINK_BUFFER_SIZE = 0x40000
+# iovecs per os.writev() call, within any platform's IOV_MAX
+SINK_MAX_IOVECS = 1024
+
+
+class FrameSink:
+    # writes (prefix, payload) pairs in large blocks: either copied into one
+    # reusable buffer, or, with vectored=True, handed to os.writev() as is
+    # (the payloads must then stay unchanged until the next flush). pending
+    # frames are written once buffer_size bytes are pending or, with
+    # max_latency, when the oldest is that many seconds old. with a
+    # BackgroundWriter, blocks are written by its thread instead.
+    def __init__(self, fp: IO[bytes], buffer_size: int=SINK_BUFFER_SIZE, max_latency: float | None = None,
+                 vectored: bool = False, writer: BackgroundWriter | None = None):
+        if vectored and (writer is not None or not hasattr(os, 'writev')):
+            vectored = False
+        self.fp = fp
+        self.buffer_size = buffer_size
+        self.max_latency = max_latency
+        self.vectored = vectored
+        self.writer = writer
+        self.buf = bytearray()
+        self.iovecs: list[ByteString] = []
+        self.pending = 0
+        self.first_pending: float | None = None
+        self.frames = 0
+        self.bytes_out = 0
+
+    def prefix(self, payload_len: int) -> bytes:
+        return b''
+
+    def write(self, payload: ByteString) -> None:
+        prefix = self.prefix(len(payload))
+        if self.vectored:
+            self.iovecs.append(prefix)
+            self.iovecs.append(payload)
+        else:
+            self.buf += prefix
+            self.buf += payload
+        self.pending += len(prefix) + len(payload)
+        self.frames += 1
+        if self.pending >= self.buffer_size:
+            self.flush()
+        elif self.max_latency is not None:
+            now = time.monotonic()
+            if self.first_pending is None:
+                self.first_pending = now
+            elif now - self.first_pending >= self.max_latency:
+                self.flush()
+
+    def _writev(self) -> None:
+        fd = self.fp.fileno()
+        iovecs = self.iovecs
+        for i in range(0, len(iovecs), SINK_MAX_IOVECS):
+            chunk = iovecs[i:i + SINK_MAX_IOVECS]
+            size = sum(map(len, chunk))
+            n = os.writev(fd, chunk)
+            if n < size:
+                # short write (pipe, signal): finish the rest the simple way
+                rest = memoryview(b''.join(chunk))[n:]
+                while rest:
+                    rest = rest[os.write(fd, rest):]
+        self.iovecs = []
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        if self.vectored:
+            self._writev()
+        elif self.writer is not None:
+            # handed over to the writer thread, so start a new buffer
+            self.writer.write(self.fp, self.buf)
+            self.buf = bytearray()
+        else:
+            write_all(self.fp, self.buf)
+            self.buf.clear()
+        self.bytes_out += self.pending
+        self.pending = 0
+        self.first_pending = None
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            if self.writer is not None:
+                self.writer.close(self.fp)
+            else:
+                self.fp.close()
+
+
+class AdtsSink(FrameSink):
+    # raw_data_block()s to ADTS frames, header from the format in effect
+    def __init__(self, fp: IO[bytes], format: Format | None = None, **kwargs):
+        super().__init__(fp, **kwargs)
+        self.header: ADTSHeaderTemplate | None = None
+        if format is not None:
+            self.set_format(format)
+
+    def set_format(self, format: Format) -> None:
+        self.header = ADTSHeader.from_format(format, 0).compile()
+
+    def prefix(self, payload_len: int) -> bytes:
+        return self.header.tobytes(payload_len)
+
+
+class RawAuSink(FrameSink):
+    # access units, each preceded by its length as a big endian integer
+    # of length_size bytes
+    def __init__(self, fp: IO[bytes], length_size: int=4, **kwargs):
+        super().__init__(fp, **kwargs)
+        self.length_size = length_size
+
+    def set_format(self, format: Format) -> None:
+        pass
+
+    def prefix(self, payload_len: int) -> bytes:
+        return payload_len.to_bytes(self.length_size, 'big')
@@ -0,0 +1,122 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import IO, Any, Callable, Iterable, Iterator, TypeVar
+import time
+
+__all__ = [ 'ParseStats', 'STAGES' ]
+
+# sync: reading the input and finding frames (TS demux included),
+# config: StreamMuxConfig decode, payload: the rest of the frame decode
+# (payloads or raw_data_blocks), write: output, timed by the caller
+STAGES = ('sync', 'config', 'payload', 'write')
+# seconds between two callback calls
+STATS_INTERVAL = 1.0
+
+T = TypeVar('T')
+
+
+@dataclass(eq=True, slots=True)
+class ParseStats:
+    # opt-in counters and per-stage times of a parse: pass one as stats= to
+    # audio_sync_stream(), adts_sequence() and friends. without it, the
+    # uninstrumented code runs unchanged. time spent by the consumer between
+    # frames is not counted, except what it adds to 'write' itself.
+    frames: int = 0
+    # frame bytes, sync headers included
+    bytes_in: int = 0
+    bytes_out: int = 0
+    # bytes skipped looking for a sync word, garbage after the last frame
+    # included
+    resync_bytes: int = 0
+    # configs different from the one before, the first included
+    config_changes: int = 0
+    # StreamMuxConfigs found in / decoded into the config cache
+    config_cache_hits: int = 0
+    config_cache_misses: int = 0
+    # frames whose decode raised; the exception is not swallowed
+    decode_errors: int = 0
+    # cumulative seconds per stage
+    times: dict[str, float] = field(default_factory=lambda: dict.fromkeys(STAGES, 0.0))
+    elapsed: float = 0.0
+    # called with the stats every interval seconds, between frames
+    callback: Callable[[ParseStats], None] | None = field(default=None, compare=False, repr=False)
+    interval: float = field(default=STATS_INTERVAL, compare=False, repr=False)
+    started: float = field(default_factory=time.perf_counter, compare=False, repr=False)
+    last_report: float = field(default=0.0, compare=False, repr=False)
+
+    def __post_init__(self):
+        self.last_report = self.started
+
+    def tick(self) -> None:
+        # one more frame done
+        self.frames += 1
+        if self.callback is not None:
+            now = time.perf_counter()
+            if now - self.last_report >= self.interval:
+                self.last_report = now
+                self.elapsed = now - self.started
+                self.callback(self)
+
+    def timed(self, iterable: Iterable[T], stage: str) -> Iterator[T]:
+        # iterable, with the time taken to produce each item added to stage
+        it = iter(iterable)
+        clock = time.perf_counter
+        times = self.times
+        while True:
+            start = clock()
+            try:
+                item = next(it)
+            except StopIteration:
+                times[stage] += clock() - start
+                return
+            times[stage] += clock() - start
+            yield item
+
+    def finish(self) -> ParseStats:
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def add(self, other: ParseStats) -> None:
+        # for totals over several parses
+        self.frames += other.frames
+        self.bytes_in += other.bytes_in
+        self.bytes_out += other.bytes_out
+        self.resync_bytes += other.resync_bytes
+        self.config_changes += other.config_changes
+        self.config_cache_hits += other.config_cache_hits
+        self.config_cache_misses += other.config_cache_misses
+        self.decode_errors += other.decode_errors
+        for stage, seconds in other.times.items():
+            self.times[stage] = self.times.get(stage, 0.0) + seconds
+        self.elapsed += other.elapsed
+
+    def to_dict(self) -> dict[str, Any]:
+        return { 'frames': self.frames, 'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out,
+                 'resync_bytes': self.resync_bytes, 'config_changes': self.config_changes,
+                 'config_cache_hits': self.config_cache_hits, 'config_cache_misses': self.config_cache_misses,
+                 'decode_errors': self.decode_errors, 'times': dict(self.times), 'elapsed': self.elapsed }
+
+    def __str__(self) -> str:
+        elapsed = self.elapsed or 1e-9
+        lines = [f'frames:         {self.frames} ({self.frames / elapsed:.0f}/s)',
+                 f'bytes:          {self.bytes_in} in, {self.bytes_out} out ({self.bytes_in / elapsed / 1e6:.1f} MB/s)',
+                 f'resync bytes:   {self.resync_bytes}',
+                 f'config changes: {self.config_changes}',
+                 f'config cache:   {self.config_cache_hits} hits, {self.config_cache_misses} misses',
+                 f'decode errors:  {self.decode_errors}']
+        for stage, seconds in self.times.items():
+            lines.append(f'{stage + ":":<15} {seconds:.3f}s ({100 * seconds / elapsed:.1f}%)')
+        lines.append(f'elapsed:        {self.elapsed:.3f}s')
+        return '\n'.join(lines)
+
+
+def _end_offset(fp: IO[bytes]) -> Callable[[], int] | None:
+    # for the instrumented parsers: the position of fp relative to where
+    # reading starts, which is the end of input once the frames run out, so
+    # that garbage after the last frame counts as resync bytes. None if fp
+    # can't tell (pipes)
+    try:
+        start = fp.tell()
+    except (AttributeError, OSError):
+        return None
+    return lambda: fp.tell() - start
@@ -0,0 +1,180 @@
+from __future__ import annotations
+from array import array
+from dataclasses import dataclass, field
+from itertools import accumulate
+from typing import IO, Any
+import os
+from .latm import loas_frames, _scan_lazy_elements
+from .adts import adts_frames
+
+__all__ = [ 'FrameTable', 'rolling_bitrate', 'find_gaps', 'rolling_bitrate_numpy', 'find_gaps_numpy' ]
+
+TABLE_KINDS = ('loas', 'adts')
+# buffer_fullness of frames decoded before any config
+BUFFER_FULLNESS_UNKNOWN = 0xffff
+
+
+def _numpy() -> Any:
+    # numpy is optional and slow to import, so it is only imported by the
+    # functions that use it; None if it isn't installed
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+@dataclass(eq=True, slots=True)
+class FrameTable:
+    # per-frame metadata in columns, about 30 bytes a frame instead of an
+    # AudioMuxElement each
+    kind: str = 'loas'
+    offsets: array = field(default_factory=lambda: array('Q'))
+    # including the sync header
+    frame_bytes: array = field(default_factory=lambda: array('H'))
+    generations: array = field(default_factory=lambda: array('I'))
+    # latm_buffer_fullness of stream 0 of the config in effect, or adts_buffer_fullness
+    buffer_fullness: array = field(default_factory=lambda: array('H'))
+    durations: array = field(default_factory=lambda: array('d'))
+    # one column per stream id, summed over sub frames
+    payload_bytes: list[array] = field(default_factory=list)
+    # per config generation: offset of the frame carrying it
+    config_offsets: array = field(default_factory=lambda: array('Q'))
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def _append(self, offset: int, frame_bytes: int, buffer_fullness: int, duration: float,
+                payload_bytes: list[int]) -> None:
+        n = len(self.offsets)
+        self.offsets.append(offset)
+        self.frame_bytes.append(frame_bytes)
+        self.generations.append(len(self.config_offsets) - 1)
+        self.buffer_fullness.append(buffer_fullness)
+        self.durations.append(duration)
+        while len(self.payload_bytes) < len(payload_bytes):
+            self.payload_bytes.append(array('I', bytes(4 * n)))
+        for i, column in enumerate(self.payload_bytes):
+            column.append(payload_bytes[i] if i < len(payload_bytes) else 0)
+
+    @classmethod
+    def scan_loas(cls, fp: IO[bytes]) -> FrameTable:
+        obj = FrameTable(kind='loas')
+        for offset, size, element, stream_mux_config, changed in _scan_lazy_elements(loas_frames(fp)):
+            if changed:
+                obj.config_offsets.append(offset)
+            if stream_mux_config is None:
+                continue
+            payload_bytes = [0] * len(stream_mux_config.streams)
+            for lengths in element.payload_lengths:
+                for i, n in enumerate(lengths):
+                    payload_bytes[i] += n
+            buffer_fullness = stream_mux_config.streams[0].latm_buffer_fullness
+            obj._append(offset, size,
+                        BUFFER_FULLNESS_UNKNOWN if buffer_fullness is None else buffer_fullness,
+                        stream_mux_config.frame_duration, payload_bytes)
+        return obj
+
+    @classmethod
+    def scan_adts(cls, fp: IO[bytes]) -> FrameTable:
+        obj = FrameTable(kind='adts')
+        fixed_header: tuple[int, int, int] | None = None
+        for offset, hdr, _ in adts_frames(fp):
+            key = hdr.format_key
+            if key != fixed_header:
+                obj.config_offsets.append(offset)
+                fixed_header = key
+            obj._append(offset, hdr.aac_frame_length, hdr.adts_buffer_fullness, hdr.frame_duration,
+                        [hdr.raw_data_length])
+        return obj
+
+    @classmethod
+    def scan(cls, path: str | os.PathLike, kind: str) -> FrameTable:
+        if kind not in TABLE_KINDS:
+            raise ValueError(f'unknown table kind: {kind}')
+        with open(path, 'rb') as fp:
+            return cls.scan_loas(fp) if kind == 'loas' else cls.scan_adts(fp)
+
+    def to_numpy(self) -> dict[str, Any]:
+        # the columns as numpy arrays sharing memory with the array columns,
+        # without a copy; payload_bytes is a list with one per stream id.
+        # while they are alive, the table can't grow
+        numpy = _numpy()
+        if numpy is None:
+            raise ImportError('FrameTable.to_numpy() requires numpy')
+        return { 'offset': numpy.frombuffer(self.offsets, numpy.uint64),
+                 'frame_bytes': numpy.frombuffer(self.frame_bytes, numpy.uint16),
+                 'generation': numpy.frombuffer(self.generations, numpy.uint32),
+                 'buffer_fullness': numpy.frombuffer(self.buffer_fullness, numpy.uint16),
+                 'duration': numpy.frombuffer(self.durations, numpy.float64),
+                 'payload_bytes': [numpy.frombuffer(column, numpy.uint32) for column in self.payload_bytes] }
+
+    def rolling_bitrate(self, window: int, payload_only: bool = False) -> array:
+        if payload_only:
+            sizes = self.payload_bytes[0] if len(self.payload_bytes) == 1 else \
+                array('Q', map(sum, zip(*self.payload_bytes)))
+        else:
+            sizes = self.frame_bytes
+        return rolling_bitrate(sizes, self.durations, window)
+
+    def gaps(self) -> tuple[array, array]:
+        return find_gaps(self.offsets, self.frame_bytes)
+
+
+def rolling_bitrate_numpy(sizes: Any, durations: Any, window: int) -> Any:
+    # rolling_bitrate() as a numpy array
+    numpy = _numpy()
+    if numpy is None:
+        raise ImportError('rolling_bitrate_numpy() requires numpy')
+    if window < 1:
+        raise ValueError(f'window must be positive: {window}')
+    bits = numpy.concatenate(([0], numpy.cumsum(numpy.asarray(sizes, numpy.float64) * 8)))
+    seconds = numpy.concatenate(([0], numpy.cumsum(numpy.asarray(durations, numpy.float64))))
+    span = seconds[window:] - seconds[:-window]
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        return numpy.where(span > 0, (bits[window:] - bits[:-window]) / span, 0.0)
+
+
+def rolling_bitrate(sizes: Any, durations: Any, window: int) -> array:
+    # bits per second over each run of `window` consecutive frames, from
+    # prefix sums; element i covers frames i .. i + window - 1. always an
+    # array('d'), computed with numpy when it is installed
+    if window < 1:
+        raise ValueError(f'window must be positive: {window}')
+    if _numpy() is not None:
+        return array('d', rolling_bitrate_numpy(sizes, durations, window).tobytes())
+    bits = array('d', accumulate((size * 8 for size in sizes), initial=0))
+    seconds = array('d', accumulate(durations, initial=0.0))
+    out = array('d')
+    for i in range(len(bits) - window):
+        span = seconds[i + window] - seconds[i]
+        out.append((bits[i + window] - bits[i]) / span if span > 0 else 0.0)
+    return out
+
+
+def find_gaps_numpy(offsets: Any, frame_bytes: Any) -> tuple[Any, Any]:
+    # find_gaps() as numpy arrays
+    numpy = _numpy()
+    if numpy is None:
+        raise ImportError('find_gaps_numpy() requires numpy')
+    offsets = numpy.asarray(offsets, numpy.int64)
+    ends = offsets[:-1] + numpy.asarray(frame_bytes, numpy.int64)[:-1]
+    gaps = offsets[1:] - ends
+    indices = numpy.nonzero(gaps)[0] + 1
+    return indices.astype(numpy.uint64), gaps[indices - 1]
+
+
+def find_gaps(offsets: Any, frame_bytes: Any) -> tuple[array, array]:
+    # (frame indices, gap sizes in bytes) of the frames that don't start
+    # right where the previous one ended, as array('Q') and array('q')
+    if _numpy() is not None:
+        indices, sizes = find_gaps_numpy(offsets, frame_bytes)
+        return array('Q', indices.tobytes()), array('q', sizes.tobytes())
+    indices = array('Q')
+    sizes = array('q')
+    for i in range(1, len(offsets)):
+        gap = offsets[i] - offsets[i - 1] - frame_bytes[i - 1]
+        if gap:
+            indices.append(i)
+            sizes.append(gap)
+    return indices, sizes
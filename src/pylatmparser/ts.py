@@ -0,0 +1,204 @@
+from __future__ import annotations
+from typing import IO, Callable, Iterator
+from .latm import StreamMuxConfigCache, AudioMuxElement, LatmDecoder, audio_sync_stream
+from .stats import ParseStats
+
+__all__ = [ 'detect_ts_packet_size', 'ts_es_stream', 'ts_latm_stream', 'audio_sync_stream_auto' ]
+
+TS_SYNC_BYTE = 0x47
+TS_PACKET_SIZES = (188, 192, 204)
+TS_READ_PACKETS = 2048
+STREAM_TYPE_LATM = 0x11
+
+
+def detect_ts_packet_size(head: bytes, packets: int=4) -> int:
+    # packet size (188, 192 for m2ts, 204 with RS parity) if head looks like
+    # a transport stream, 0 otherwise
+    for size in TS_PACKET_SIZES:
+        prefix = 4 if size == 192 else 0
+        if len(head) < size * packets:
+            continue
+        if all(head[prefix + i * size] == TS_SYNC_BYTE for i in range(packets)):
+            return size
+    return 0
+
+
+class _Section:
+    # reassembles a PSI section that may span several TS packets
+    def __init__(self):
+        self.data = bytearray()
+
+    def push(self, payload: memoryview, unit_start: bool) -> bytes | None:
+        if unit_start:
+            pointer_field = payload[0]
+            self.data = bytearray(payload[1 + pointer_field:])
+        elif self.data:
+            self.data += payload
+        else:
+            return None
+        if len(self.data) < 3:
+            return None
+        section_length = 3 + ((self.data[1] & 0x0f) << 8 | self.data[2])
+        if len(self.data) < section_length:
+            return None
+        section = bytes(self.data[:section_length])
+        self.data = bytearray()
+        return section
+
+
+def _parse_pat(section: bytes) -> list[int]:
+    if section[0] != 0x00:
+        return []
+    end = len(section) - 4
+    pmt_pids = []
+    for i in range(8, end, 4):
+        program_number = section[i] << 8 | section[i + 1]
+        if program_number != 0:
+            pmt_pids.append((section[i + 2] & 0x1f) << 8 | section[i + 3])
+    return pmt_pids
+
+
+def _parse_pmt(section: bytes, stream_type: int) -> int | None:
+    if section[0] != 0x02:
+        return None
+    end = len(section) - 4
+    i = 12 + ((section[10] & 0x0f) << 8 | section[11])
+    while i + 5 <= end:
+        if section[i] == stream_type:
+            return (section[i + 1] & 0x1f) << 8 | section[i + 2]
+        i += 5 + ((section[i + 3] & 0x0f) << 8 | section[i + 4])
+    return None
+
+
+def ts_es_stream(fp: IO[bytes], pid: int | None = None, stream_type: int=STREAM_TYPE_LATM,
+                 on_discontinuity: Callable[[], None] | None = None) -> Iterator[bytes]:
+    # elementary stream bytes of pid, in arbitrary pieces. without pid, the
+    # first PMT entry with stream_type is used. packets of pid repeated with
+    # the same continuity_counter are dropped; when packets of pid went
+    # missing (a continuity_counter jump, or a packet flagged with
+    # transport_error_indicator), on_discontinuity() is called before the
+    # next piece.
+    head = fp.read(max(TS_PACKET_SIZES) * 4)
+    packet_size = detect_ts_packet_size(head)
+    if not packet_size:
+        raise ValueError('not an MPEG-2 transport stream')
+    prefix = 4 if packet_size == 192 else 0
+
+    sections: dict[int, _Section] = { 0: _Section() }
+    pes_header = bytearray()
+    in_pes_header = False
+    # continuity_counter and contents of the last packet of pid with payload
+    last_cc: int | None = None
+    last_packet = b''
+    buf = bytearray(head)
+    while True:
+        data = fp.read(packet_size * TS_READ_PACKETS)
+        buf += data
+        view = memoryview(buf)
+        pos = 0
+        end = len(buf) - packet_size
+        while pos <= end:
+            p = pos + prefix
+            if buf[p] != TS_SYNC_BYTE:
+                # lost sync: look for two sync bytes a packet apart
+                p = buf.find(TS_SYNC_BYTE, p + 1)
+                while 0 <= p and p + packet_size < len(buf) and buf[p + packet_size] != TS_SYNC_BYTE:
+                    p = buf.find(TS_SYNC_BYTE, p + 1)
+                if p < 0 or p + packet_size >= len(buf):
+                    pos = max(len(buf) - packet_size, pos + 1)
+                    break
+                pos = p - prefix
+                continue
+            pos += packet_size
+            b1 = buf[p + 1]
+            packet_pid = (b1 & 0x1f) << 8 | buf[p + 2]
+            if b1 & 0x80:
+                # transport_error_indicator: the packet is damaged. if it
+                # looks like one of ours, its data is missing
+                if packet_pid == pid and pid is not None:
+                    last_cc = None
+                    if on_discontinuity is not None:
+                        on_discontinuity()
+                continue
+            if packet_pid != pid and packet_pid not in sections:
+                continue
+            afc = buf[p + 3] >> 4 & 3
+            if not afc & 1:
+                continue
+            start = p + 4
+            if afc & 2:
+                start += 1 + buf[start]
+            if packet_pid == pid:
+                cc = buf[p + 3] & 0x0f
+                packet = bytes(buf[p:p + 188])
+                if cc == last_cc and packet == last_packet:
+                    # a duplicate packet, which is allowed once
+                    continue
+                # a jump is fine where discontinuity_indicator is set
+                discontinuity = afc & 2 and buf[p + 4] and buf[p + 5] & 0x80
+                if last_cc is not None and cc != (last_cc + 1) & 0x0f and not discontinuity:
+                    if on_discontinuity is not None:
+                        on_discontinuity()
+                last_cc = cc
+                last_packet = packet
+            payload_end = p + 188
+            if start >= payload_end:
+                continue
+            payload = view[start:payload_end]
+            unit_start = bool(b1 & 0x40)
+            if packet_pid == pid:
+                if unit_start:
+                    pes_header = bytearray()
+                    in_pes_header = True
+                if in_pes_header:
+                    # skip the PES header, which may span packets
+                    pes_header += payload
+                    if len(pes_header) < 9:
+                        continue
+                    header_length = 9 + pes_header[8]
+                    if len(pes_header) < header_length:
+                        continue
+                    in_pes_header = False
+                    if len(pes_header) > header_length:
+                        yield bytes(pes_header[header_length:])
+                else:
+                    yield bytes(payload)
+                continue
+            section = sections[packet_pid].push(payload, unit_start)
+            if section is None:
+                continue
+            if packet_pid == 0:
+                for pmt_pid in _parse_pat(section):
+                    sections.setdefault(pmt_pid, _Section())
+            elif pid is None:
+                pid = _parse_pmt(section, stream_type)
+        payload = None
+        view.release()
+        del buf[:pos]
+        if not data:
+            return
+
+
+def ts_latm_stream(fp: IO[bytes], pid: int | None = None, config_cache: StreamMuxConfigCache | None = None,
+                   lazy: bool = False, stats: ParseStats | None = None) -> Iterator[AudioMuxElement]:
+    decoder = LatmDecoder(config_cache, lazy=lazy, stats=stats)
+    # after lost packets, drop the partial frame and resync
+    es = ts_es_stream(fp, pid, STREAM_TYPE_LATM, decoder.reset)
+    if stats is not None:
+        es = stats.timed(es, 'sync')
+    for data in es:
+        decoder.feed(data)
+        yield from decoder.frames()
+    if stats is not None:
+        # a partial frame (or a stray byte) left at the end
+        stats.resync_bytes += len(decoder.buf) - decoder.pos
+
+
+def audio_sync_stream_auto(fp: IO[bytes], pid: int | None = None,
+                           stats: ParseStats | None = None) -> Iterator[AudioMuxElement]:
+    # LOAS or MPEG-2 TS carrying LATM, whichever fp turns out to be
+    head = fp.read(max(TS_PACKET_SIZES) * 4)
+    fp.seek(0)
+    if detect_ts_packet_size(head):
+        return ts_latm_stream(fp, pid, stats=stats)
+    return audio_sync_stream(fp, stats=stats)
@@ -0,0 +1,109 @@
+import random
+import pytest
+from pylatmparser import ADTSHeader, Format, audio_sync_stream, convert_adts_to_latm
+
+LC_STEREO_48K = Format(audio_object_type=2, channel_configuration=2, sampling_frequency_index=3)
+LC_MONO_44K = Format(audio_object_type=2, channel_configuration=1, sampling_frequency_index=4)
+
+
+def adts_frame(format: Format, blocks: list[bytes], protected: bool = False) -> bytes:
+    # adts_frame() carrying blocks as its raw_data_block()s; CRCs are zero
+    hdr = ADTSHeader(audio_object_type=format.audio_object_type,
+                     sampling_frequency_index=format.sampling_frequency_index,
+                     channel_configuration=format.channel_configuration,
+                     protection_absent=0 if protected else 1, adts_buffer_fullness=0x7ff,
+                     number_of_raw_data_blocks_in_frame=len(blocks) - 1)
+    if not protected:
+        assert len(blocks) == 1
+        body = blocks[0]
+    elif len(blocks) == 1:
+        body = bytes(2) + blocks[0]
+    else:
+        # raw_data_block_position[1..n] relative to the first block, header
+        # crc_check, then each block followed by its crc_check
+        positions = [0]
+        for block in blocks[:-1]:
+            positions.append(positions[-1] + len(block) + 2)
+        body = b''.join(position.to_bytes(2, 'big') for position in positions[1:]) + bytes(2)
+        body += b''.join(block + bytes(2) for block in blocks)
+    hdr.aac_frame_length = 7 + len(body)
+    return hdr.tobytes() + body
+
+
+def payloads(rng: random.Random, count: int) -> list[bytes]:
+    # sizes around 255 exercise the escaped PayloadLengthInfo()
+    return [rng.randbytes(rng.choice((1, 100, 254, 255, 256, 600))) for _ in range(count)]
+
+
+def remux(tmp_path, adts: bytes, config_interval: int):
+    src, dst = tmp_path / 'in.aac', tmp_path / 'out.latm'
+    src.write_bytes(adts)
+    result = convert_adts_to_latm(str(src), str(dst), config_interval)
+    with open(dst, 'rb') as fp:
+        elements = list(audio_sync_stream(fp))
+    assert result.frames == len(elements)
+    return elements
+
+
+def element_payload(element) -> bytes:
+    assert len(element.sub_frames) == 1 and len(element.sub_frames[0]) == 1
+    return bytes(element.sub_frames[0][0].payload)
+
+
+def element_format(element) -> Format:
+    assert len(element.stream_mux_config.streams) == 1
+    return element.stream_mux_config.streams[0].audio_specific_config.format
+
+
+@pytest.mark.parametrize('config_interval', [0, 1, 3])
+def test_round_trip(tmp_path, config_interval):
+    aus = payloads(random.Random(config_interval), 10)
+    elements = remux(tmp_path, b''.join(adts_frame(LC_STEREO_48K, [au]) for au in aus), config_interval)
+    assert [element_payload(element) for element in elements] == aus
+    for i, element in enumerate(elements):
+        carries_config = i == 0 or (config_interval > 0 and i % config_interval == 0)
+        assert element.use_same_stream_mux == (0 if carries_config else 1)
+        assert (element.stream_mux_config is not None) == carries_config
+        if carries_config:
+            assert element_format(element) == LC_STEREO_48K
+
+
+def test_multiple_raw_data_blocks(tmp_path):
+    rng = random.Random(1)
+    adts = b''
+    aus = []
+    for num_blocks in (1, 2, 4, 3, 1):
+        blocks = payloads(rng, num_blocks)
+        adts += adts_frame(LC_STEREO_48K, blocks, protected=True)
+        aus += blocks
+    elements = remux(tmp_path, adts, 1)
+    # one AudioMuxElement per raw_data_block
+    assert [element_payload(element) for element in elements] == aus
+    assert all(element_format(element) == LC_STEREO_48K for element in elements)
+
+
+@pytest.mark.parametrize('config_interval', [0, 1, 3])
+def test_format_change(tmp_path, config_interval):
+    rng = random.Random(2)
+    first, second = payloads(rng, 5), payloads(rng, 5)
+    adts = b''.join(adts_frame(LC_STEREO_48K, [au]) for au in first)
+    adts += b''.join(adts_frame(LC_MONO_44K, [au]) for au in second)
+    elements = remux(tmp_path, adts, config_interval)
+    assert [element_payload(element) for element in elements] == first + second
+    # a new config goes out with the first frame of each format, and the
+    # interval restarts there
+    for i, element in enumerate(elements):
+        j = i % 5
+        carries_config = j == 0 or (config_interval > 0 and j % config_interval == 0)
+        assert (element.stream_mux_config is not None) == carries_config
+        if carries_config:
+            assert element_format(element) == (LC_STEREO_48K if i < 5 else LC_MONO_44K)
+
+
+def test_program_config_element(tmp_path):
+    # channel_configuration 0: the PCE is in the raw data block, and can't
+    # go into the AudioSpecificConfig
+    format = Format(audio_object_type=2, channel_configuration=0, sampling_frequency_index=3)
+    adts = adts_frame(format, [bytes(100)])
+    with pytest.raises(NotImplementedError, match='channel_configuration 0'):
+        remux(tmp_path, adts, 1)
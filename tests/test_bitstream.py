@@ -0,0 +1,35 @@
+import pytest
+from pylatmparser.bitstream import available_backends, load_backend
+
+
+@pytest.fixture(params=available_backends())
+def backend(request):
+    return load_backend(request.param)
+
+
+@pytest.mark.parametrize('read', [
+    lambda bits: bits.read(17),
+    lambda bits: (bits.read(9), bits.read(8)),
+    lambda bits: (bits.read(3), bits.read(14)),
+    lambda bits: bits.skip(17),
+    lambda bits: (bits.skip(12), bits.read(5)),
+    lambda bits: bits.read_bytes(24),
+    lambda bits: (bits.read(4), bits.read_bytes(13)),
+    lambda bits: bits.peek(17),
+    lambda bits: (bits.read(3), bits.child().read(14)),
+], ids=['read', 'read_twice', 'read_unaligned', 'skip', 'skip_read', 'read_bytes', 'read_bytes_unaligned',
+        'peek', 'child'])
+def test_read_past_end(backend, read):
+    # never zero padding: the same ValueError from every backend
+    with pytest.raises(ValueError, match='read past the end'):
+        read(backend.BitReader(b'\xab\xcd'))
+
+
+def test_read_to_end(backend):
+    bits = backend.BitReader(b'\xab\xcd')
+    assert bits.peek(16) == 0xabcd
+    assert bits.read(3) == 0b101
+    assert bytes(bits.read_bytes(13)) == b'\x5e\x68'
+    assert bits.bits_left() == 0
+    bits.skip(0)
+    bits.byte_align()
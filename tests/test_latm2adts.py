@@ -0,0 +1,94 @@
+import random
+import sys
+import pytest
+from pylatmparser import (AudioSpecificConfig, Format, Stream, StreamMuxConfig, adts_sequence,
+                          convert_latm_to_adts, latm2adts)
+from pylatmparser.bitstream import BitWriter
+
+LC_STEREO_48K = Format(audio_object_type=2, channel_configuration=2, sampling_frequency_index=3)
+
+
+def run(monkeypatch, *args: str) -> int:
+    monkeypatch.setattr(sys, 'argv', ['latm2adts', *args])
+    with pytest.raises(SystemExit) as e:
+        latm2adts()
+    return e.value.code
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    # same file name in two directories
+    paths = []
+    for d in ('d1', 'd2'):
+        (tmp_path / d).mkdir()
+        path = tmp_path / d / 'cap.latm'
+        path.write_bytes(b'')
+        paths.append(str(path))
+    return paths
+
+
+@pytest.mark.parametrize('all_streams', [False, True])
+def test_colliding_outputs(tmp_path, monkeypatch, capsys, inputs, all_streams):
+    out = tmp_path / 'out'
+    args = ['-a'] if all_streams else []
+    assert run(monkeypatch, *args, '-j', '1', '-o', str(out), *inputs) == 1
+    assert 'both write to' in capsys.readouterr().err
+    # nothing was converted
+    assert not out.exists()
+
+
+def test_template_without_name(tmp_path, monkeypatch, capsys, inputs):
+    inputs[1] = inputs[1].replace('cap.latm', 'other.latm')
+    out = tmp_path / 'out'
+    assert run(monkeypatch, '-a', '-t', 'p{program}.aac', '-j', '1', '-o', str(out), *inputs) == 1
+    assert 'both write to' in capsys.readouterr().err
+
+
+def test_manifest_outputs(tmp_path, monkeypatch, capsys, inputs):
+    manifest = tmp_path / 'manifest'
+    manifest.write_text(f'{inputs[0]} {tmp_path}/a.aac\n{inputs[1]} {tmp_path}/b.aac\n')
+    # empty inputs fail, but both are tried
+    assert run(monkeypatch, '-j', '1', '-m', str(manifest)) == 1
+    err = capsys.readouterr().err
+    assert 'both write to' not in err and '0 converted, 2 failed' in err
+
+
+def two_program_loas(formats: list[Format], aus: list[list[bytes]]) -> bytes:
+    # AudioMuxElements with one stream per program, all in one sub frame
+    streams = [Stream(id=i, program=i, audio_specific_config=AudioSpecificConfig.from_format(format),
+                      latm_buffer_fullness=0xff) for i, format in enumerate(formats)]
+    config = StreamMuxConfig(all_streams_same_time_framing=1, num_sub_frames=1, num_program=len(streams),
+                             streams=streams)
+    out = bytearray()
+    for payloads in zip(*aus):
+        bits = BitWriter()
+        bits.write(0, 1)
+        config.encode(bits)
+        for payload in payloads:
+            # PayloadLengthInfo()
+            for _ in range(len(payload) // 255):
+                bits.write(255, 8)
+            bits.write(len(payload) % 255, 8)
+        for payload in payloads:
+            bits.write_bytes(payload)
+        body = bits.tobytes()
+        out += bytes([0x56, 0xe0 | len(body) >> 8, len(body) & 0xff]) + body
+    return bytes(out)
+
+
+def test_unsupported_stream_skipped(tmp_path, monkeypatch, capsys):
+    # TwinVQ can't go into ADTS; the AAC program still converts
+    rng = random.Random(1)
+    formats = [LC_STEREO_48K, Format(audio_object_type=7, channel_configuration=1, sampling_frequency_index=3)]
+    aus = [[rng.randbytes(rng.randrange(1, 400)) for _ in range(20)] for _ in formats]
+    src = tmp_path / 'in.latm'
+    src.write_bytes(two_program_loas(formats, aus))
+    result = convert_latm_to_adts(str(src), str(tmp_path / '{name}.p{program}.aac'), all_streams=True)
+    assert result.outputs == [str(tmp_path / 'in.p0.aac')]
+    assert result.skipped == ['program 1 layer 0: AOT 7 with channel_configuration 1']
+    with open(result.outputs[0], 'rb') as fp:
+        assert [bytes(payload) for _, payload in adts_sequence(fp)] == aus[0]
+    # the command line reports it, and doesn't fail
+    monkeypatch.setattr(sys, 'argv', ['latm2adts', '-a', '-t', '{name}.p{program}.aac', str(src)])
+    latm2adts()
+    assert 'skipped program 1 layer 0: AOT 7' in capsys.readouterr().err
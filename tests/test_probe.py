@@ -0,0 +1,17 @@
+import pytest
+from benchmarks.synth import SynthSpec, synth_loas
+from pylatmparser import probe, quick_probe
+
+
+@pytest.mark.parametrize('garbage_rate', [0.0, 0.25])
+def test_quick_probe_duration(tmp_path, garbage_rate):
+    # large enough to be sampled; junk between frames is part of the size
+    # the duration is extrapolated from
+    path = tmp_path / 'in.latm'
+    path.write_bytes(synth_loas(SynthSpec(frames=4000, payload_size=300, garbage_rate=garbage_rate,
+                                          garbage_max=300)))
+    with open(path, 'rb') as fp:
+        exact = probe(fp).duration
+    result = quick_probe(path)
+    assert not result.exact
+    assert result.duration == pytest.approx(exact, rel=0.05)
@@ -0,0 +1,74 @@
+import random
+import pytest
+from pylatmparser import AdtsSink, BackgroundWriter, Format, RawAuSink
+
+LC_STEREO_48K = Format(audio_object_type=2, channel_configuration=2, sampling_frequency_index=3)
+
+
+class ShortWriter:
+    # unbuffered file stand-in that takes at most limit bytes per write()
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.data = bytearray()
+        self.closed = False
+
+    def write(self, data) -> int:
+        n = min(len(data), self.limit)
+        self.data += data[:n]
+        return n
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def expected_raw(aus: list[bytes]) -> bytes:
+    return b''.join(len(au).to_bytes(4, 'big') + au for au in aus)
+
+
+@pytest.fixture
+def aus():
+    rng = random.Random(0)
+    return [rng.randbytes(rng.randint(1, 800)) for _ in range(300)]
+
+
+@pytest.mark.parametrize('write_behind', [False, True])
+def test_short_writes(aus, write_behind):
+    fp = ShortWriter(1000)
+    writer = BackgroundWriter(2) if write_behind else None
+    sink = RawAuSink(fp, buffer_size=4096, writer=writer)
+    for au in aus:
+        sink.write(au)
+    sink.close()
+    if writer is not None:
+        writer.join()
+    assert fp.closed
+    assert bytes(fp.data) == expected_raw(aus)
+    assert sink.bytes_out == len(fp.data)
+
+
+@pytest.mark.parametrize('vectored', [False, True])
+def test_adts_output(tmp_path, aus, vectored):
+    path = tmp_path / 'out.aac'
+    sink = AdtsSink(open(path, 'wb', buffering=0), LC_STEREO_48K, buffer_size=4096, vectored=vectored)
+    for au in aus:
+        sink.write(au)
+    sink.close()
+    data = path.read_bytes()
+    assert len(data) == sink.bytes_out == sum(len(au) + 7 for au in aus)
+    pos = 0
+    for au in aus:
+        assert data[pos:pos + 2] == b'\xff\xf1'
+        assert (int.from_bytes(data[pos + 3:pos + 6], 'big') >> 5) & 0x1fff == len(au) + 7
+        assert data[pos + 7:pos + 7 + len(au)] == au
+        pos += len(au) + 7
+
+
+@pytest.mark.parametrize('format', [
+    Format(audio_object_type=5, channel_configuration=2, sampling_frequency_index=3),
+    Format(audio_object_type=2, channel_configuration=0, sampling_frequency_index=3),
+])
+def test_adts_unsupported_format(format):
+    # what ADTSHeader.supports() rejects, set_format() refuses up front
+    sink = AdtsSink(ShortWriter(100))
+    with pytest.raises(NotImplementedError):
+        sink.set_format(format)
@@ -0,0 +1,110 @@
+import asyncio
+import io
+import os
+import random
+import subprocess
+import sys
+import pytest
+from benchmarks.synth import SynthSpec, synth_loas
+from pylatmparser import LatmDecoder, audio_sync_stream, audio_sync_stream_async, audio_sync_stream_mmap, probe
+from pylatmparser.bitstream import BACKEND, BACKEND_ENV, available_backends
+from pylatmparser.index import FrameIndex
+from pylatmparser.parallel import parallel_audio_sync_stream
+from pylatmparser.table import FrameTable
+
+# every way of reading an AudioSyncStream must give what audio_sync_stream()
+# gives; this module runs on the selected backend, and test_backends()
+# reruns it on the others
+
+
+def elements(stream) -> list:
+    # comparable form of AudioMuxElements and LazyAudioMuxElements
+    return [(element.stream_mux_config, element.use_same_stream_mux,
+             [[(packet.stream_id, bytes(packet.payload)) for packet in packets] for packets in element.sub_frames])
+            for element in stream]
+
+
+@pytest.fixture(scope='module')
+def path(tmp_path_factory):
+    # junk between frames, and in-band config changes: a new profile, and
+    # a stretch where only the first frame carries the config
+    specs = [SynthSpec(frames=600, garbage_rate=0.1, seed=1),
+             SynthSpec(frames=400, profile='he', num_sub_frames=2, payload_size=200, garbage_rate=0.1, seed=2),
+             SynthSpec(frames=400, programs=2, config_interval=0, payload_size=150, garbage_rate=0.1, seed=3),
+             SynthSpec(frames=300, profile='pce', config_interval=4, garbage_rate=0.1, seed=4)]
+    path = tmp_path_factory.mktemp('sync_stream') / 'in.latm'
+    path.write_bytes(b'junk' + b''.join(synth_loas(spec) for spec in specs) + b'\x56\xe0')
+    return path
+
+
+@pytest.fixture(scope='module')
+def expected(path):
+    with open(path, 'rb') as fp:
+        result = elements(audio_sync_stream(fp))
+    assert len(result) == 1700
+    return result
+
+
+@pytest.mark.parametrize('range_size', [4096, 50000, 1 << 20])
+def test_parallel(path, expected, range_size):
+    assert elements(parallel_audio_sync_stream(path, jobs=2, range_size=range_size)) == expected
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_mmap(path, expected, lazy):
+    assert elements(audio_sync_stream_mmap(path, lazy=lazy)) == expected
+
+
+def test_lazy(path, expected):
+    with open(path, 'rb') as fp:
+        assert elements(audio_sync_stream(fp, lazy=True)) == expected
+
+
+@pytest.mark.parametrize('chunk_size', [1, 997, 1 << 16])
+def test_small_chunks(path, expected, chunk_size):
+    with open(path, 'rb') as fp:
+        assert elements(audio_sync_stream(fp, chunk_size)) == expected
+
+
+def test_async(path, expected):
+    async def parse():
+        reader = asyncio.StreamReader()
+        reader.feed_data(path.read_bytes())
+        reader.feed_eof()
+        return [element async for element in audio_sync_stream_async(reader, chunk_size=4093)]
+    assert elements(asyncio.run(parse())) == expected
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_decoder_feed_splits(path, expected, seed):
+    rng = random.Random(seed)
+    data = path.read_bytes()
+    decoder = LatmDecoder()
+    got = []
+    pos = 0
+    while pos < len(data):
+        n = rng.choice((1, 2, 3, rng.randrange(1, 100), rng.randrange(1, 5000)))
+        decoder.feed(data[pos:pos + n])
+        pos += n
+        got += decoder.frames()
+    assert elements(got) == expected
+
+
+@pytest.mark.skipif(os.environ.get(BACKEND_ENV) is not None, reason='already running on a chosen backend')
+@pytest.mark.parametrize('backend', [name for name in available_backends() if name != BACKEND])
+def test_backends(backend):
+    env = dict(os.environ, **{ BACKEND_ENV: backend })
+    result = subprocess.run([sys.executable, '-m', 'pytest', '-q', '-p', 'no:cacheprovider', __file__],
+                            env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout
+
+
+def test_config_changes(path):
+    # the scanners agree on where the config changes: once per segment
+    with open(path, 'rb') as fp:
+        segments = [segment.offset for segment in probe(fp).segments]
+        fp.seek(0)
+        assert list(FrameIndex.build_loas(fp).config_offsets) == segments
+        fp.seek(0)
+        assert list(FrameTable.scan_loas(fp).config_offsets) == segments
+    assert len(segments) == 4
@@ -0,0 +1,117 @@
+import io
+import random
+import re
+import pytest
+from pylatmparser import (Format, LoasMuxer, ParseStats, StreamMuxConfig, audio_sync_stream, loas_frames,
+                          ts_latm_stream)
+
+LATM_PID = 0x101
+PMT_PID = 0x1000
+SYNC_WORD = re.compile(rb'\x56[\xe0-\xff]')
+LC_STEREO_48K = Format(audio_object_type=2, channel_configuration=2, sampling_frequency_index=3)
+
+
+def crc32_mpeg(data: bytes) -> int:
+    crc = 0xffffffff
+    for byte in data:
+        crc ^= byte << 24
+        for _ in range(8):
+            crc = (crc << 1) ^ 0x104c11db7 if crc & 0x80000000 else crc << 1
+    return crc
+
+
+def psi_section(table_id: int, body: bytes) -> bytes:
+    section_length = 5 + len(body) + 4
+    section = bytes([table_id, 0xb0 | section_length >> 8, section_length & 0xff, 0, 1, 0xc1, 0, 0]) + body
+    return section + crc32_mpeg(section).to_bytes(4, 'big')
+
+
+def ts_packets(pid: int, data: bytes, cc: list[int], psi: bool = False) -> list[bytes]:
+    # data as one PES packet or PSI section; the last packet is stuffed with
+    # an adaptation field (PSI: 0xff)
+    if psi:
+        data = b'\0' + data
+    packets = []
+    first = True
+    while first or data:
+        header = bytes([0x47, (0x40 if first else 0) | pid >> 8, pid & 0xff])
+        chunk, data = data[:184], data[184:]
+        stuffing = 184 - len(chunk)
+        if not stuffing:
+            packets.append(header + bytes([0x10 | cc[0]]) + chunk)
+        elif psi:
+            packets.append(header + bytes([0x10 | cc[0]]) + chunk + b'\xff' * stuffing)
+        else:
+            adaptation = bytes([stuffing - 1]) + (b'\0' + b'\xff' * (stuffing - 2) if stuffing > 1 else b'')
+            packets.append(header + bytes([0x30 | cc[0]]) + adaptation + chunk)
+        cc[0] = (cc[0] + 1) & 0x0f
+        first = False
+    return packets
+
+
+def mux_ts(loas: bytes, seed: int = 0) -> list[bytes]:
+    # PAT, PMT with one LATM stream, then LOAS in PES packets of random size
+    rng = random.Random(seed)
+    packets = ts_packets(0, psi_section(0x00, bytes([0, 1, 0xe0 | PMT_PID >> 8, PMT_PID & 0xff])), [0], True)
+    pmt = bytes([0xe0 | LATM_PID >> 8, LATM_PID & 0xff, 0xf0, 0, 0x11, 0xe0 | LATM_PID >> 8, LATM_PID & 0xff, 0xf0, 0])
+    packets += ts_packets(PMT_PID, psi_section(0x02, pmt), [0], True)
+    cc = [0]
+    pos = 0
+    while pos < len(loas):
+        es = loas[pos:pos + rng.randint(200, 1500)]
+        pos += len(es)
+        pes = b'\0\0\1\xc0' + (len(es) + 3).to_bytes(2, 'big') + b'\x80\0\0' + es
+        packets += ts_packets(LATM_PID, pes, cc)
+    return packets
+
+
+@pytest.fixture(scope='module')
+def loas() -> bytes:
+    # no sync word lookalikes inside the frames, so that after lost packets
+    # the decoder can only resync on real ones
+    rng = random.Random(1)
+    muxer = LoasMuxer(StreamMuxConfig.from_format(LC_STEREO_48K))
+    frames = []
+    while len(frames) < 300:
+        frame = muxer.tobytes(rng.randbytes(rng.randint(100, 150)))
+        if not SYNC_WORD.search(frame, 1):
+            frames.append(frame)
+    return b''.join(frames)
+
+
+def elements(stream: bytes) -> list:
+    return list(audio_sync_stream(io.BytesIO(stream)))
+
+
+def demux(packets: list[bytes], stats: ParseStats | None = None) -> list:
+    return list(ts_latm_stream(io.BytesIO(b''.join(packets)), stats=stats))
+
+
+def test_round_trip(loas):
+    assert demux(mux_ts(loas)) == elements(loas)
+
+
+def test_duplicate_packet(loas):
+    packets = mux_ts(loas)
+    for i in (10, 150, len(packets) - 2):
+        packets.insert(i + 1, packets[i])
+    assert demux(packets) == elements(loas)
+
+
+@pytest.mark.parametrize('how', ['dropped', 'transport_error'])
+def test_lost_packet(loas, how):
+    packets = mux_ts(loas)
+    expected = elements(loas)
+    lost = [50, 51, 150]
+    for i in reversed(lost):
+        if how == 'dropped':
+            del packets[i]
+        else:
+            packets[i] = packets[i][:1] + bytes([packets[i][1] | 0x80]) + packets[i][2:]
+    stats = ParseStats()
+    got = demux(packets, stats)
+    # the frames the lost packets were part of are skipped; the rest come out intact
+    assert len(expected) - 6 <= len(got) < len(expected)
+    it = iter(expected)
+    assert all(element in it for element in got)
+    assert stats.resync_bytes > 0